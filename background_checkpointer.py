@@ -0,0 +1,152 @@
+"""
+Saves NEAT checkpoints without holding up training. They're the same files as
+neat.Checkpointer saves, so they can be loaded in the same ways.
+"""
+
+import atexit
+import copy
+import gzip
+import os
+import pickle
+import queue
+import random
+import threading
+
+import neat
+
+
+class BackgroundCheckpointer(neat.Checkpointer):
+    """a neat.Checkpointer that takes a snapshot of the state on the training
+    thread, by pickling it, and compresses and writes it on a background thread.
+    The next generation changes the genomes' fitnesses and the species, so the
+    snapshot can't be put off, and the pickling is still most of the cost of a
+    save: only the compressing and writing, about a third of it, is taken off the
+    training thread. DeltaCheckpointer (see checkpoint_store.py) pickles less.
+    A checkpoint is saved every generation_interval generations or every
+    time_interval_seconds, whichever comes first (None switches either off).
+    Each file is written under a temporary name and then renamed, so a checkpoint
+    file is never left half written. If keep_last is given, only that many of the
+    checkpoints saved by this checkpointer are kept. If writing a checkpoint fails,
+    the error is raised on the training thread at the next save, or by close.
+    If get_rng_states is given, it's called at each save for a dict of the states
+    of numpy Generators (their bit_generator.state), which is saved as the
+    rng_states of the saved config, so a run can carry on with the same random
+    numbers (see checkpoint_store.load_checkpoint)"""
+
+    def __init__(
+        self,
+        generation_interval=1,
+        time_interval_seconds=300,
+        filename_prefix="neat-checkpoint-",
+        keep_last=None,
+        get_rng_states=None,
+    ):
+        super().__init__(generation_interval, time_interval_seconds, filename_prefix)
+        if keep_last is not None and keep_last < 1:
+            raise ValueError("keep_last must be at least 1, or None to keep them all")
+        self.keep_last = keep_last
+        self.get_rng_states = get_rng_states
+        # the checkpoints written, oldest first
+        self.saved = []
+        self.error = None
+        self.closed = False
+        # at most this many checkpoints wait to be written before saving waits
+        self.checkpoints = queue.Queue(maxsize=2)
+        self.thread = threading.Thread(
+            target=self.write_checkpoints, name="checkpoint writer", daemon=True
+        )
+        self.thread.start()
+        # finish writing if training stops without close being called
+        atexit.register(self.close)
+
+    def __getstate__(self):
+        """neat's species set refers to its reporters, so this is pickled in every
+        checkpoint, without its thread and queue. An unpickled one doesn't save
+        anything, but can be pickled again, as it is when a run that was loaded
+        from a checkpoint saves one"""
+        state = self.__dict__.copy()
+        for key in ("checkpoints", "thread", "error", "get_rng_states"):
+            state.pop(key, None)
+        state["closed"] = True
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.error = None
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        """snapshot the current state and queue it to be written"""
+        self.raise_error()
+        filename = f"{self.filename_prefix}{generation}"
+        print(f"Saving checkpoint to {filename}")
+        data = pickle.dumps(
+            self.get_state(config, population, species_set, generation),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        self.checkpoints.put((filename, data))
+
+    def get_state(self, config, population, species_set, generation):
+        """what's saved in a checkpoint: the tuple neat.Checkpointer saves. If there
+        are numpy Generators, their states are added to a copy of the config"""
+        if self.get_rng_states is not None:
+            config = copy.copy(config)
+            config.rng_states = self.get_rng_states()
+        return (generation, config, population, species_set, random.getstate())
+
+    def write_checkpoints(self):
+        """write the queued checkpoints until None is queued. Each is written by
+        write_checkpoint, called with what was queued"""
+        while True:
+            checkpoint = self.checkpoints.get()
+            if checkpoint is None:
+                return
+            try:
+                self.write_checkpoint(*checkpoint)
+                self.remove_old_checkpoints(checkpoint[0])
+            except Exception as error:
+                self.error = error
+
+    def write_checkpoint(self, filename, data):
+        """compress and write a checkpoint"""
+        write_file(filename, gzip.compress(data, compresslevel=5))
+
+    def remove_old_checkpoints(self, filename):
+        """note that a checkpoint has been written and delete any old ones that
+        aren't to be kept"""
+        if filename in self.saved:
+            self.saved.remove(filename)
+        self.saved.append(filename)
+        if self.keep_last is not None:
+            while len(self.saved) > self.keep_last:
+                self.remove_checkpoint(self.saved.pop(0))
+
+    def remove_checkpoint(self, filename):
+        """delete a checkpoint"""
+        os.remove(filename)
+
+    def raise_error(self):
+        """raise any error from writing a checkpoint"""
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+    def close(self):
+        """wait for the queued checkpoints to be written"""
+        if not self.closed:
+            self.closed = True
+            self.checkpoints.put(None)
+            self.thread.join()
+            atexit.unregister(self.close)
+        self.raise_error()
+
+
+def write_file(filename, data):
+    """write a file under a temporary name and then rename it, so that it's never
+    left half written"""
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_filename, filename)
@@ -1,22 +1,23 @@
+import itertools
 import random
-from enum import Enum
 
 import numpy as np
+from numba import njit
 
-
-class Directions(Enum):
-    """Directions a maze can go in"""
-
-    DIRECTION_UP = 1
-    DIRECTION_DOWN = 2
-    DIRECTION_LEFT = 3
-    DIRECTION_RIGHT = 4
+# up, down, left, right as (row, column) steps
+DIRECTIONS = np.array([(-1, 0), (1, 0), (0, -1), (0, 1)], dtype=np.int64)
+# every order the directions can be tried in. Each square gets one at random
+DIRECTION_ORDERS = np.array(list(itertools.permutations(range(4))), dtype=np.int64)
 
 
 class Backtracking:
-    """backtracking algorithm for creating a maze"""
+    """backtracking algorithm for creating a maze.
+    It's the same algorithm as the recursive version at
+    https://aryanab.medium.com/maze-generation-recursive-backtracking-5981bc5cc766
+    but it keeps its own stack, so it isn't limited by Python's recursion limit.
+    rng is a numpy Generator. If it's None, one is seeded from the random module"""
 
-    def __init__(self, height, width):
+    def __init__(self, height, width, rng=None):
         """heigth and width of maze should be odd, so add one if even"""
         if width % 2 == 0:
             width += 1
@@ -25,67 +26,76 @@ class Backtracking:
 
         self.width = width
         self.height = height
+        self.rng = rng
 
     def create_maze(self):
         """create a maze"""
-        maze = np.ones((self.height, self.width), dtype=float)
-
-        for i in range(self.height):
-            for j in range(self.width):
-                if i % 2 == 1 or j % 2 == 1:
-                    maze[i, j] = 0
-                if i == 0 or j == 0 or i == self.height - 1 or j == self.width - 1:
-                    maze[i, j] = 0.5
-
-        maze_sx = random.choice(range(2, self.width - 2, 2))
-        maze_sy = random.choice(range(2, self.height - 2, 2))
-
-        self.generator(maze_sx, maze_sy, maze)
-
-        for i in range(self.height):
-            for j in range(self.width):
-                if maze[i, j] == 0.5:
-                    maze[i, j] = 1
-
-        return maze
-
-    def generator(self, maze_cx, maze_cy, grid):
-        """maze generator"""
-        grid[maze_cy, maze_cx] = 0.5
-
+        return self.create_mazes(1)[0]
+
+    def create_mazes(self, count):
+        """create count mazes in one go, as an array of shape (count, height, width).
+        Paths are 1 and walls are 0. The squares are at even rows and columns,
+        with the border all path, and the walls between squares are knocked through"""
+        rng = self.rng
+        if rng is None:
+            rng = np.random.default_rng(random.getrandbits(64))
+
+        mazes = np.zeros((count, self.height, self.width), dtype=np.int8)
+        mazes[:, ::2, ::2] = 1
+        mazes[:, [0, -1], :] = 1
+        mazes[:, :, [0, -1]] = 1
+
+        square_rows = (self.height - 3) // 2
+        square_cols = (self.width - 3) // 2
+        for maze in mazes:
+            start_row = 2 + 2 * rng.integers(square_rows)
+            start_col = 2 + 2 * rng.integers(square_cols)
+            direction_orders = rng.integers(
+                len(DIRECTION_ORDERS), size=(square_rows, square_cols)
+            )
+            generator(maze, start_row, start_col, direction_orders)
+
+        return mazes
+
+
+@njit(cache=True, nogil=True)
+def generator(grid, start_row, start_col, direction_orders):
+    """maze generator. Walks from square to square, knocking through the wall to
+    any square that hasn't been visited and going back when there isn't one.
+    Each square tries the directions in the order given by direction_orders"""
+    square_rows, square_cols = direction_orders.shape
+    visited = np.zeros((square_rows, square_cols), dtype=np.bool_)
+    # the squares on the path back to the start and how many directions each has tried
+    stack_rows = np.empty(square_rows * square_cols, dtype=np.int64)
+    stack_cols = np.empty(square_rows * square_cols, dtype=np.int64)
+    stack_tried = np.empty(square_rows * square_cols, dtype=np.int64)
+
+    top = 0
+    stack_rows[0] = (start_row - 2) // 2
+    stack_cols[0] = (start_col - 2) // 2
+    stack_tried[0] = 0
+    visited[stack_rows[0], stack_cols[0]] = True
+    while top >= 0:
+        row = stack_rows[top]
+        col = stack_cols[top]
+        tried = stack_tried[top]
+        if tried == 4:
+            top -= 1
+            continue
+        stack_tried[top] += 1
+
+        direction = DIRECTION_ORDERS[direction_orders[row, col], tried]
+        next_row = row + DIRECTIONS[direction, 0]
+        next_col = col + DIRECTIONS[direction, 1]
         if (
-            grid[maze_cy - 2, maze_cx] == 0.5
-            and grid[maze_cy + 2, maze_cx] == 0.5
-            and grid[maze_cy, maze_cx - 2] == 0.5
-            and grid[maze_cy, maze_cx + 2] == 0.5
+            0 <= next_row < square_rows
+            and 0 <= next_col < square_cols
+            and not visited[next_row, next_col]
         ):
-            pass
-        else:
-            maze_li = [1, 2, 3, 4]
-            while len(maze_li) > 0:
-                direction = random.choice(maze_li)
-                maze_li.remove(direction)
-
-                if direction == Directions.DIRECTION_UP.value:
-                    maze_ny = maze_cy - 2
-                    maze_my = maze_cy - 1
-                elif direction == Directions.DIRECTION_DOWN.value:
-                    maze_ny = maze_cy + 2
-                    maze_my = maze_cy + 1
-                else:
-                    maze_ny = maze_cy
-                    maze_my = maze_cy
-
-                if direction == Directions.DIRECTION_LEFT.value:
-                    maze_nx = maze_cx - 2
-                    maze_mx = maze_cx - 1
-                elif direction == Directions.DIRECTION_RIGHT.value:
-                    maze_nx = maze_cx + 2
-                    maze_mx = maze_cx + 1
-                else:
-                    maze_nx = maze_cx
-                    maze_mx = maze_cx
-
-                if grid[maze_ny, maze_nx] != 0.5:
-                    grid[maze_my, maze_mx] = 0.5
-                    self.generator(maze_nx, maze_ny, grid)
+            # knock through the wall between the squares
+            grid[2 + row + next_row, 2 + col + next_col] = 1
+            visited[next_row, next_col] = True
+            top += 1
+            stack_rows[top] = next_row
+            stack_cols[top] = next_col
+            stack_tried[top] = 0
@@ -0,0 +1,289 @@
+"""
+Times the hot paths of the simulation, and whole headless generations, with fixed
+seeds, so optimisations can be measured before and after.
+
+    python benchmark.py                  run everything and compare with the baseline
+    python benchmark.py --save-baseline  run everything and save it as the baseline
+    python benchmark.py maze_solver      run only the benchmarks whose names start
+                                         with any of the names given
+
+Each benchmark is run enough times to take at least 0.2 seconds (one run of a
+generation is enough), that is repeated --repeat times and the best is kept, as
+timeit does. Anything compiled by numba is compiled before it's timed. The mice are
+timed through MouseBatch, as the simulation moves them. Baselines depend on the
+machine, so save one on the machine the comparisons will be made on. Benchmarks
+that have got more than --tolerance slower than the baseline are reported as
+regressions, and the exit status is 1 if there are any.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+import neat
+import numpy as np
+
+import config
+import simulation
+from backtracking import Backtracking
+from maze import Maze
+from maze_solver import MazeSolver
+from mouse_batch import MouseBatch
+
+SEED = 1
+BASELINE_FILE = "benchmark_baseline.json"
+POPULATION_SIZES = (50, 150, 300)
+# how many mice the benchmarks of MouseBatch's kernels have
+MICE = 150
+
+
+def get_maze(seed=SEED):
+    """a solved maze that is the same every time"""
+    maze1 = Maze(
+        config.MAZE_ROWS,
+        config.MAZE_COLS,
+        config.MAZE_SQUARE_SIZE,
+        config.MAZE_DIRECTORY,
+        make_maze_big=not config.WALLS_FROM_MAZE_TINY,
+    )
+    maze1.create(np.random.default_rng(seed))
+    maze1.solve()
+    return maze1
+
+
+def get_mouse_batch(maze1, count=MICE, frames=500):
+    """a MouseBatch of count mice in a maze, each of which has walked along the
+    shortest path from a different place on it, leaving its trail and fading it as
+    it would in the simulation. They're all still hunting"""
+    walls, walls_scale = maze1.get_walls()
+    wall_distance_table = None
+    if maze1.wall_distance_table is not None:
+        wall_distance_table = maze1.wall_distance_table[np.newaxis]
+    mice = MouseBatch(
+        count,
+        (config.WINDOW_WIDTH, config.WINDOW_HEIGHT),
+        np.asarray(walls)[np.newaxis],
+        [maze1.path_distance],
+        [maze1.distance_score],
+        np.inf,
+        0.0,
+        walls_scale,
+        wall_distance_table,
+    )
+    idx = np.arange(count)
+    # the squares of the path, from the start to the end
+    path = np.argwhere(np.asarray(maze1.on_path))
+    path = path[np.argsort(-maze1.distance_to_exit[path[:, 0], path[:, 1]])]
+    starts = idx * len(path) // count
+    for frame in range(frames):
+        rows, cols = path[(starts + frame * len(path) // frames) % len(path)].T
+        mice.position[:, 0] = (cols + 0.5) * config.MAZE_SQUARE_SIZE
+        mice.position[:, 1] = (rows + 0.5) * config.MAZE_SQUARE_SIZE
+        mice.position_rounded[:] = np.rint(mice.position)
+        mice.update_visited(idx)
+        if frame % mice.frames_between_blurring_visited == 0:
+            mice.visited.fade_visited(idx)
+    return mice
+
+
+def bench_create_maze():
+    rng = np.random.default_rng(SEED)
+    backtracking = Backtracking(
+        height=config.MAZE_ROWS + 1, width=config.MAZE_COLS + 1, rng=rng
+    )
+    return backtracking.create_maze
+
+
+def bench_solve_maze():
+    maze_tiny = get_maze().maze_tiny
+    return lambda: MazeSolver(maze_tiny).solve_maze()
+
+
+def bench_get_big_bool_maze():
+    maze_tiny = get_maze().maze_tiny
+    return lambda: Maze.get_big_bool_maze(maze_tiny, config.MAZE_SQUARE_SIZE)
+
+
+def bench_get_maze_wall_distances():
+    """every vision angle of every mouse, each somewhere on the shortest path"""
+    mice = get_mouse_batch(get_maze())
+    idx = mice.hunting()
+    return lambda: mice.get_maze_wall_distances(idx)
+
+
+def bench_update_visited():
+    mice = get_mouse_batch(get_maze())
+    idx = mice.hunting()
+    return lambda: mice.update_visited(idx)
+
+
+def bench_fade_visited():
+    """fading every mouse's record, and then looking around, which applies the
+    fades to the tiles that the mice see, as on a frame when the mice fade"""
+    mice = get_mouse_batch(get_maze())
+    idx = mice.hunting()
+
+    def fade_visited():
+        mice.visited.fade_visited(idx)
+        mice.get_maze_wall_distances(idx)
+
+    return fade_visited
+
+
+def get_generation_bench(neat_config, population_size):
+    """a whole headless generation, simulated in this process"""
+
+    def bench_generation():
+        neat_config.pop_size = population_size
+        random.seed(SEED)
+        genomes = list(neat.Population(neat_config).population.items())
+        mazes = [get_maze(SEED + i) for i in range(config.MAZES_PER_GENERATION)]
+        return lambda: simulation.Simulation(
+            genomes, neat_config, 1, mazes, 0.0
+        ).run()
+
+    return bench_generation
+
+
+def get_benchmarks(neat_config, population_sizes):
+    """the benchmarks by name, each a function that sets up and returns the function
+    to time, and whether it's slow enough to only run once a repeat"""
+    benchmarks = {
+        "backtracking.create_maze": (bench_create_maze, False),
+        "maze_solver.solve_maze": (bench_solve_maze, False),
+        "maze.get_big_bool_maze": (bench_get_big_bool_maze, False),
+        "mouse_batch.get_maze_wall_distances": (
+            bench_get_maze_wall_distances,
+            False,
+        ),
+        "mouse_batch.update_visited": (bench_update_visited, False),
+        "mouse_batch.fade_visited": (bench_fade_visited, False),
+    }
+    for population_size in population_sizes:
+        benchmarks[f"generation.pop_{population_size}"] = (
+            get_generation_bench(neat_config, population_size),
+            True,
+        )
+    return benchmarks
+
+
+def time_benchmark(setup, slow, repeat):
+    """the best time of one call of the function that setup returns, in seconds"""
+    function = setup()
+    # compile anything numba compiles
+    function()
+    timer = timeit.Timer(function)
+    if slow:
+        number = 1
+    else:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def compare(results, baseline, tolerance):
+    """print the results against the baseline. Returns the names of the benchmarks
+    that have got slower than the tolerance allows"""
+    regressions = []
+    print(f"{'benchmark':<40}{'seconds':>12}{'baseline':>12}{'change':>10}")
+    for name, seconds in results.items():
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds is None:
+            print(f"{name:<40}{seconds:>12.6f}{'-':>12}{'-':>10}")
+            continue
+        change = seconds / baseline_seconds - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<40}{seconds:>12.6f}{baseline_seconds:>12.6f}{change:>+10.1%}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="time the simulation's hot paths",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument(
+        "names", nargs="*", help="only run the benchmarks that start with these"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="save the results as the baseline"
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE_FILE, help="the baseline file to use"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="how many times to repeat each benchmark"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="how much slower than the baseline counts as a regression (0.1 is 10%%)",
+    )
+    parser.add_argument(
+        "--population-sizes",
+        type=int,
+        nargs="+",
+        default=POPULATION_SIZES,
+        help="the population sizes to time whole generations at",
+    )
+    args = parser.parse_args()
+
+    local_dir = os.path.dirname(__file__)
+    neat_config = neat.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        os.path.join(local_dir, "maze_mouse_neat.config"),
+    )
+    benchmarks = get_benchmarks(neat_config, args.population_sizes)
+    if args.names:
+        benchmarks = {
+            name: benchmark
+            for name, benchmark in benchmarks.items()
+            if name.startswith(tuple(args.names))
+        }
+
+    results = {}
+    for name, (setup, slow) in benchmarks.items():
+        results[name] = time_benchmark(setup, slow, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        # keep the baseline of any benchmarks that weren't run
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(
+                {
+                    "saved": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "machine": platform.platform(),
+                    "python": platform.python_version(),
+                    "results": baseline,
+                },
+                f,
+                indent=4,
+            )
+        print(f"saved the baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
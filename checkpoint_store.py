@@ -0,0 +1,261 @@
+"""
+Checkpoints that save each genome only once, however many checkpoints it's in.
+A checkpoint directory holds:
+    genomes/abcd....pack a pack: the genomes that were new in a checkpoint, as a
+                       gzipped pickle of a dict of their pickles (without their
+                       fitnesses) by the SHA-256 hash of each pickle. It's named
+                       by a hash of the genome hashes in it
+    <prefix><generation> a manifest: a gzipped pickle of a dict with
+                       genome_packs, the pack of each genome it refers to by the
+                       genome's hash, and state, the pickled tuple that a
+                       BackgroundCheckpointer saves, with each genome pickled as a
+                       reference to the store (with its fitness)
+Elites and the genomes that make up the species carry over from one generation to
+the next unchanged, so they're only saved in the pack of the checkpoint they first
+appear in. Each checkpoint writes at most one pack, with one fsync.
+load_checkpoint loads these checkpoints and neat.Checkpointer's alike.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+import pickle
+
+from background_checkpointer import BackgroundCheckpointer, write_file
+
+GENOMES_DIRECTORY = "genomes"
+
+
+class GenomeStore:
+    """packs of pickled genomes in a directory, one file each, named by their hash.
+    The packs that are loaded are kept, as a checkpoint's genomes come from a few"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.packs = {}
+
+    def path(self, pack_name):
+        return os.path.join(self.directory, pack_name + ".pack")
+
+    def save(self, pack_name, genomes):
+        """save a dict of pickled genomes, by their hash, as a pack, unless it's
+        already saved"""
+        path = self.path(pack_name)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        data = pickle.dumps(genomes, protocol=pickle.HIGHEST_PROTOCOL)
+        write_file(path, gzip.compress(data, compresslevel=5))
+
+    def load(self, pack_name, genome_hash):
+        """the pickled genome with this hash, from a pack"""
+        pack = self.packs.get(pack_name)
+        if pack is None:
+            with gzip.open(self.path(pack_name)) as f:
+                pack = pickle.load(f)
+            self.packs[pack_name] = pack
+        return pack[genome_hash]
+
+    def remove(self, pack_name):
+        """delete a pack, if it's there"""
+        self.packs.pop(pack_name, None)
+        try:
+            os.remove(self.path(pack_name))
+        except FileNotFoundError:
+            pass
+
+
+class ManifestPickler(pickle.Pickler):
+    """pickles a checkpoint's state with every genome as a reference to the store.
+    get_genome_hash is called to get the hash of each genome"""
+
+    def __init__(self, file, genome_type, get_genome_hash):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.genome_type = genome_type
+        self.get_genome_hash = get_genome_hash
+
+    def persistent_id(self, obj):
+        if isinstance(obj, self.genome_type):
+            return ("genome", self.get_genome_hash(obj), obj.fitness)
+        return None
+
+
+class ManifestUnpickler(pickle.Unpickler):
+    """unpickles a checkpoint's state, loading its genomes from the packs in
+    genome_packs (by genome hash) in the store. A genome that's referred to more
+    than once (e.g. in the population and in a species) is loaded as one object"""
+
+    def __init__(self, file, genome_store, genome_packs):
+        super().__init__(file)
+        self.genome_store = genome_store
+        self.genome_packs = genome_packs
+        self.genomes = {}
+
+    def persistent_load(self, pid):
+        kind, genome_hash, fitness = pid
+        if kind != "genome":
+            raise pickle.UnpicklingError(f"unknown reference to a {kind}")
+        genome = self.genomes.get(genome_hash)
+        if genome is None:
+            genome = pickle.loads(
+                self.genome_store.load(self.genome_packs[genome_hash], genome_hash)
+            )
+            self.genomes[genome_hash] = genome
+        genome.fitness = fitness
+        return genome
+
+
+class DeltaCheckpointer(BackgroundCheckpointer):
+    """a BackgroundCheckpointer that saves checkpoints to a directory as manifests
+    that refer to a store of genomes (see the top of this file). Only the genomes
+    it hasn't seen before are pickled on the training thread. When old checkpoints
+    are deleted (see keep_last), so are the packs that no checkpoint left in the
+    directory refers to. A pack is kept while any of its genomes is, so keep_last
+    also limits the size of the store, unless it's None"""
+
+    def __init__(
+        self,
+        generation_interval=1,
+        time_interval_seconds=300,
+        filename_prefix="neat-checkpoint-",
+        keep_last=10,
+        directory="checkpoints",
+        get_rng_states=None,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(
+            generation_interval,
+            time_interval_seconds,
+            os.path.join(directory, filename_prefix),
+            keep_last,
+            get_rng_states,
+        )
+        self.directory = directory
+        self.genome_store = GenomeStore(os.path.join(directory, GENOMES_DIRECTORY))
+        # the genome, its hash and its pack for each genome in the last checkpoint,
+        # by id. Genomes aren't changed once they've been made, apart from their
+        # fitness
+        self.genome_hashes = {}
+        # the packs each manifest in the directory refers to, as they're read
+        self.manifest_packs = {}
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for key in ("genome_hashes", "manifest_packs"):
+            state.pop(key, None)
+        return state
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        """snapshot the current state, pickling only the genomes that haven't been
+        seen before, and queue it to be written with a pack of the new genomes"""
+        self.raise_error()
+        filename = f"{self.filename_prefix}{generation}"
+        print(f"Saving checkpoint to {filename}")
+
+        genome_hashes = {}
+        new_genomes = {}
+
+        def get_genome_hash(genome):
+            seen = self.genome_hashes.get(id(genome))
+            if seen is not None:
+                genome_hash = seen[1]
+                genome_hashes[id(genome)] = seen
+            else:
+                genome_hash, data = pickle_genome(genome)
+                new_genomes[genome_hash] = data
+                genome_hashes[id(genome)] = (genome, genome_hash, None)
+            return genome_hash
+
+        file = io.BytesIO()
+        pickler = ManifestPickler(file, config.genome_type, get_genome_hash)
+        pickler.dump(self.get_state(config, population, species_set, generation))
+
+        pack_name = None
+        if new_genomes:
+            pack_name = get_pack_name(new_genomes)
+        # forget the genomes that have gone
+        self.genome_hashes = {
+            key: (genome, genome_hash, pack or pack_name)
+            for key, (genome, genome_hash, pack) in genome_hashes.items()
+        }
+
+        genome_packs = {
+            genome_hash: pack for _, genome_hash, pack in self.genome_hashes.values()
+        }
+        manifest = {"genome_packs": genome_packs, "state": file.getvalue()}
+        self.checkpoints.put((filename, manifest, pack_name, new_genomes))
+
+    def write_checkpoint(self, filename, manifest, pack_name, new_genomes):
+        """save the pack of new genomes, then the manifest that refers to it"""
+        if new_genomes:
+            self.genome_store.save(pack_name, new_genomes)
+        write_file(
+            filename,
+            gzip.compress(
+                pickle.dumps(manifest, protocol=pickle.HIGHEST_PROTOCOL),
+                compresslevel=5,
+            ),
+        )
+        self.manifest_packs[filename] = set(manifest["genome_packs"].values())
+
+    def remove_checkpoint(self, filename):
+        """delete a manifest, and the packs that no other manifest refers to"""
+        packs = self.get_manifest_packs(filename)
+        os.remove(filename)
+        del self.manifest_packs[filename]
+
+        prefix = os.path.basename(self.filename_prefix)
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and not name.endswith(".tmp"):
+                packs -= self.get_manifest_packs(os.path.join(self.directory, name))
+        for pack_name in packs:
+            self.genome_store.remove(pack_name)
+
+    def get_manifest_packs(self, filename):
+        """the names of the packs a manifest refers to"""
+        if filename not in self.manifest_packs:
+            self.manifest_packs[filename] = set(
+                read_manifest(filename)["genome_packs"].values()
+            )
+        return set(self.manifest_packs[filename])
+
+
+def pickle_genome(genome):
+    """pickle a genome without its fitness, which changes from one generation to
+    the next. Returns the hash of the pickle and the pickle"""
+    fitness = genome.fitness
+    genome.fitness = None
+    try:
+        data = pickle.dumps(genome, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        genome.fitness = fitness
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def get_pack_name(genomes):
+    """the name of the pack of a dict of pickled genomes, by their hash"""
+    return hashlib.sha256("".join(sorted(genomes)).encode()).hexdigest()
+
+
+def read_manifest(filename):
+    with gzip.open(filename) as f:
+        return pickle.load(f)
+
+
+def load_checkpoint(filename):
+    """load a checkpoint saved by a DeltaCheckpointer, a BackgroundCheckpointer or
+    neat.Checkpointer. Returns (generation, config, population, species_set,
+    random state, rng states), ready for neat.Population and random.setstate.
+    rng states is the config's rng_states (see BackgroundCheckpointer), or None
+    if no numpy Generator states were saved"""
+    checkpoint = read_manifest(filename)
+    if isinstance(checkpoint, dict):
+        # a manifest rather than a full checkpoint
+        genome_store = GenomeStore(
+            os.path.join(os.path.dirname(filename), GENOMES_DIRECTORY)
+        )
+        checkpoint = ManifestUnpickler(
+            io.BytesIO(checkpoint["state"]), genome_store, checkpoint["genome_packs"]
+        ).load()
+    return checkpoint + (getattr(checkpoint[1], "rng_states", None),)
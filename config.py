@@ -1,5 +1,65 @@
+import os
+
 MAZES_TO_ATTEMPT = 10000
+# the seed for all the randomness in a run: the mazes, the mice's starting
+# directions and NEAT. Runs with the same seed have the same mazes and fitnesses.
+# If None, a seed is picked (and printed, so the run can be repeated).
+# Can also be set with the --seed command line option
+SEED = None
 FRAME_DISPLAY_RATE = 100
+# run the simulation without pygame, for machines without a display.
+# can also be switched on with the --headless command line option
+HEADLESS = False
+# the simulation sends snapshots of itself to a viewer in another process (see
+# viewer.py), which listens on VIEWER_ADDRESS and draws at up to VIEWER_FPS.
+# With SERVE_SNAPSHOTS (or the --serve command line option), a headless run
+# serves snapshots too, so a viewer can be attached to it with "python viewer.py"
+VIEWER_ADDRESS = ("localhost", 6011)
+VIEWER_AUTHKEY = b"not ai mouse"
+VIEWER_FPS = 60
+SERVE_SNAPSHOTS = False
+# a checkpoint of NEAT's population is saved every CHECKPOINT_GENERATION_INTERVAL
+# generations or every CHECKPOINT_TIME_INTERVAL_SECONDS, whichever comes first
+# (None switches either off), keeping only the last CHECKPOINT_KEEP_LAST of them
+# (None keeps them all). They are written in the background. See
+# BackgroundCheckpointer
+CHECKPOINT_GENERATION_INTERVAL = 1
+CHECKPOINT_TIME_INTERVAL_SECONDS = 300
+CHECKPOINT_KEEP_LAST = None
+CHECKPOINT_FILENAME_PREFIX = "neat-checkpoint-"
+# save checkpoints to CHECKPOINT_DIRECTORY as small manifests that refer to a store
+# of genomes, where each genome is saved only once however many checkpoints it's
+# in, rather than as full copies of the population. See checkpoint_store.py. Only
+# the last CHECKPOINT_STORE_KEEP_LAST checkpoints and the genomes they need are
+# kept (None keeps them all, and every genome)
+CHECKPOINT_STORE = False
+CHECKPOINT_DIRECTORY = "checkpoints"
+CHECKPOINT_STORE_KEEP_LAST = 10
+# time each phase of the frame loop and write a record of the totals for each
+# generation to PHASE_TIMINGS_FILE, as CSV if it ends in .csv, otherwise as a line
+# of JSON. The viewer writes records of its own phases to VIEWER_PHASE_TIMINGS_FILE.
+# Can also be switched on with the --timings command line option. See phase_timer.py
+PHASE_TIMINGS = False
+PHASE_TIMINGS_FILE = os.path.join("timings", "phase_timings.csv")
+VIEWER_PHASE_TIMINGS_FILE = os.path.join("timings", "viewer_phase_timings.csv")
+# when headless, genomes can be evaluated on this many processes (1 means no workers).
+# the population is handed out to them in batches of EVALUATION_BATCH_SIZE
+EVALUATION_WORKERS = 1
+EVALUATION_BATCH_SIZE = 10
+# mazes are created and solved this many generations ahead on a background thread.
+# 0 creates each generation's maze when it's needed
+MAZE_PREFETCH_COUNT = 2
+# each genome is scored in this many mazes a generation, all simulated at once.
+# Its fitness is the "mean" or "min" of its scores, or their MAZES_FITNESS_QUANTILE
+# "quantile"
+MAZES_PER_GENERATION = 1
+MAZES_FITNESS = "mean"
+MAZES_FITNESS_QUANTILE = 0.25
+# stop the mice that can't get a good enough fitness to reproduce, checking every
+# PRUNE_EVERY_FRAMES frames. See Simulation. Mice are only pruned when the whole
+# population is simulated in one process, so not with EVALUATION_WORKERS
+PRUNE = False
+PRUNE_EVERY_FRAMES = 50
 BLACK = (0, 0, 0)
 WHITE = (200, 200, 200)
 PURE_WHITE = (255, 255, 255)
@@ -15,13 +75,24 @@ if MAZE_ROWS % 2 == 0:
 if MAZE_COLS % 2 == 0:
     MAZE_COLS += 1
 
+# the mice look up walls in the maze's grid of squares (maze_tiny) rather than in a
+# copy of it stretched to one element per pixel (maze_big), which isn't made at all.
+# The mice see the same walls either way
+WALLS_FROM_MAZE_TINY = True
+# the mice look up how far away the walls are in a table made for each maze, rather
+# than following each line of sight until it reaches a wall. The table has a
+# distance for each pixel and each of WALL_DISTANCE_TABLE_HEADINGS directions, so
+# the mice see the walls as if they were looking in the nearest of those directions
+WALL_DISTANCE_TABLE = False
+WALL_DISTANCE_TABLE_HEADINGS = 32
+
 # mouse will "crash" if it takes more than this distance to complete the maze
 MAZE_MAX_DISTANCE_TO_COMPLETE = MAZE_ROWS * MAZE_COLS * MAZE_SQUARE_SIZE**1.5
 MAZE_MAX_DISTANCE_TO_COMPLETE = MAZE_ROWS * MAZE_COLS * MAZE_SQUARE_SIZE // 35
-# mazes that the mouse fails to solve are saved here.
+# mazes that the mouse fails to solve are saved to the corpus here (see MazeCorpus).
 # Any mazes in here are reloaded at the start of session.
-MAZE_DIRECTORY = f"mazes\\{MAZE_COLS}x{MAZE_ROWS}\\"
-MAZE_STATS_DIRECTORY = f"maze_stats\\{MAZE_COLS}x{MAZE_ROWS}\\"
+MAZE_DIRECTORY = os.path.join("mazes", f"{MAZE_COLS}x{MAZE_ROWS}")
+MAZE_STATS_DIRECTORY = os.path.join("maze_stats", f"{MAZE_COLS}x{MAZE_ROWS}")
 
 WINDOW_WIDTH = MAZE_COLS * MAZE_SQUARE_SIZE
 WINDOW_HEIGHT = MAZE_ROWS * MAZE_SQUARE_SIZE
@@ -1,4 +1,8 @@
 """
+*** HOW TO BENCHMARK ***
+Run benchmark.py, which times the hot paths and whole generations with fixed seeds
+and compares them with a saved baseline. See the docstring at the top of it
+
 *** HOW TO PROFILE ***
 Install gprof2dot and dot
 On Windows, to install dot, install Graphviz and make sure the path to the bin folder
@@ -19,270 +23,254 @@ Have a look at output.png
 # https://github.com/AryanAb/MazeGenerator/blob/master/backtracking.py
 # A good alternative might be https://github.com/AryanAb/MazeGenerator/blob/master/hunt_and_kill.py
 
-import gzip
+import argparse
 import math
+import multiprocessing
 import os
 import os.path
 import pickle
 import random
-# import the pygame module, so you can use it
-import sys
+import time
 
 import neat
-import pygame
+import numpy as np
 
 import config
-import maze
-import mouse
-import stats
-from maze_drawer import MazeDrawer
-from maze_solver import MazeSolver
-from mouse_drawer import MouseDrawer
+import simulation
+from background_checkpointer import BackgroundCheckpointer
+from checkpoint_store import DeltaCheckpointer, load_checkpoint
+from maze_prefetch import MazePrefetcher
+from parallel_evaluator import ParallelEvaluator
+from phase_timer import SIMULATION_PHASES, PhaseTimer, write_record
+from snapshots import SnapshotPublisher
 
 generation = 0
+# set by run_neat when generations are evaluated on more than one process
+evaluator = None
+# set by run_neat when mazes are built ahead of time
+prefetcher = None
+# set by run_neat when snapshots are served to a viewer
+publisher = None
+# set by run_neat from the run's seed (see seed_rngs)
+maze_rng = None
+direction_rng = None
 # SINGLE_MAZE_FILE = "maze_CRASHED_20220601-215248_path-46.txt"
 CHECKPOINT_FILE_TO_LOAD = None
 # CHECKPOINT_FILE_TO_LOAD = "neat-checkpoint-110"
 
-sys.setrecursionlimit(8000)
-
 
 def run_maze(genomes, neat_config):
     global generation
     generation += 1
 
-    # initialize the pygame module
-    pygame.init()
-    # clock = pygame.time.Clock()
-    # start_time = time.monotonic()
-    # load and set the logo
-    logo = pygame.image.load("logo32x32.png")
-    pygame.display.set_icon(logo)
-    pygame.display.set_caption("Not AI mouse")
-
-    window_size = (config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
-
-    # create a surface on screen that has the size defined globally
-    screen = pygame.display.set_mode(window_size)
-    background = pygame.Surface(window_size)
-
-    maze_path_surface = pygame.Surface(window_size)  # , pygame.SRCALPHA, 32)
-    maze_path_surface.set_alpha(60)
-    maze_path_surface.fill((255, 255, 255))
-
-    visited_by_mouse_screen = pygame.Surface(window_size, pygame.SRCALPHA, 32)
-    visited_by_mouse_screen = visited_by_mouse_screen.convert_alpha()
-    visited_by_mouse_screen.fill((0, 0, 0, 0))
-
-    maze_wall_distances_screen = pygame.Surface(window_size, pygame.SRCALPHA, 32)
-    maze_wall_distances_screen = maze_wall_distances_screen.convert_alpha()
-
-    stats_surface = pygame.Surface(window_size)
-    stats_surface = stats_surface.convert_alpha()
-    stats_surface.fill((0, 0, 0, 0))
-
-    # define a variable to control the main loop
-    running = True
-    paused = False
-    frame_number = 0
-    draw_frame = True
-    maze_area = (
-        (config.MAZE_ROWS - 2) * (config.MAZE_COLS - 2) * config.MAZE_SQUARE_SIZE
-    )
-    # max_distance = round(
-    #     (2.5 * maze_area + 1500 * math.sqrt(generation))
-    #     / mouse.OPTIMISE_MOUSE_SPEED_MAX_INITIAL
-    # )
-    max_distance = round(6.0 * maze_area / mouse.OPTIMISE_MOUSE_SPEED_MAX_INITIAL)
-    initial_direction_radians = random.uniform(-math.pi, math.pi)
-
-    maze1 = maze.Maze(
-        config.MAZE_ROWS,
-        config.MAZE_COLS,
-        config.MAZE_SQUARE_SIZE,
-        config.MAZE_DIRECTORY,
-    )
-
-    maze1.create()
-
-    maze_solver = MazeSolver(maze1.maze_tiny)
-    (
-        maze_is_solved,
-        maze_min_path_distance,
-        maze_distance_score,
-        maze_path,
-    ) = maze_solver.solve_maze()
-    maze1.path_distance = maze_min_path_distance
-
-    maze_drawer = MazeDrawer(maze1, window_size, background, maze_path_surface)
-    maze_drawer.draw_maze(maze1.maze_tiny, config.PURE_WHITE, config.BLACK)
-    maze_drawer.draw_shortest_path(maze_path)
-    maze_drawer.draw_start(background, config.MAZE_SQUARE_SIZE, (100, 100, 100))
-    maze_drawer.draw_finish(
-        window_size, background, config.MAZE_SQUARE_SIZE, (100, 100, 100)
-    )
-
-    mouse_drawer = MouseDrawer(
-        background,
-        visited_by_mouse_screen,
-        maze_wall_distances_screen,
-    )
-
-    # Init NEAT
-    nets = []
-    mice = []
-
-    stats_info_global = {
-        "max distace": max_distance,
-        "generation": generation,
-        "frame": 0,
-        "mice hunting": 0,
-        "mice successful": 0,
-        "mice crashed": 0,
-        "mice spun out": 0,
-        "mice timed out": 0,
-        "mice pottering": 0,
-    }
-
-    for id, g in genomes:
-        net = neat.nn.FeedForwardNetwork.create(g, neat_config)
-        nets.append(net)
-        g.fitness = 0
-
-        # Init mice
-        mouse_to_add = mouse.Mouse(
-            window_size,
-            maze1.maze_big,
-            maze_min_path_distance,
-            maze_distance_score,
-            max_distance,
-            initial_direction_radians,
+    if direction_rng is not None:
+        initial_direction_radians = direction_rng.uniform(-math.pi, math.pi)
+    else:
+        initial_direction_radians = random.uniform(-math.pi, math.pi)
+    mazes = []
+    for _ in range(config.MAZES_PER_GENERATION):
+        if prefetcher is not None:
+            mazes.append(prefetcher.get())
+        else:
+            mazes.append(simulation.new_maze(maze_rng))
+
+    start_time = time.perf_counter()
+    timer = None
+    if evaluator is not None:
+        if config.PHASE_TIMINGS:
+            timer = PhaseTimer(SIMULATION_PHASES)
+        outcome_counts = evaluator.evaluate(
+            genomes, generation, mazes, initial_direction_radians, timer
         )
-        mice.append(mouse_to_add)
-
-    # main loop
-    while running:
-        frame_number += 1
-        mouse_drawn = False
-        stats_info_global["frame"] = frame_number
-        if frame_number % config.FRAME_DISPLAY_RATE == 0:
-            draw_frame = True
+    else:
+        maze_simulation = simulation.Simulation(
+            genomes, neat_config, generation, mazes, initial_direction_radians
+        )
+        if publisher is not None:
+            maze_simulation.run(publisher.update)
         else:
-            draw_frame = False
-
-        # event handling, gets all event from the event queue
-        for event in pygame.event.get():
-            # only do something if the event is of type QUIT
-            if event.type == pygame.QUIT:
-                # change the value to False, to exit the main loop
-                running = False
-                sys.exit()
-                break
-
-            # for the next bit, on windows, you need to:
-            # pip install windows-curses
-            # https://stackoverflow.com/questions/35850362/importerror-no-module-named-curses-when-trying-to-import-blessings
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-                    sys.exit()
-                    break
-                elif event.key == pygame.K_SPACE:
-                    paused = not paused
-
-        if paused:
-            continue
-
-        mice_hunting = 0
-        for index, mousei in enumerate(mice):
-            if mousei.status is mouse.MouseStatus.HUNTING:
-                mouse_status_previous = mousei.status
-                mousei.get_maze_wall_distances()
-                output = nets[index].activate(mousei.get_data())
-
-                steering_radians_scaled = output[0]
-                speed_delta_scaled = output[1]
-                mousei.move_scaled(draw_frame, steering_radians_scaled, speed_delta_scaled)
-
-                # check if the status has changes
-                if mousei.status is not mouse_status_previous:
-                    if mousei.status is not mouse.MouseStatus.HUNTING:
-                        genomes[index][1].fitness = mousei.score
-                        if mousei.status is mouse.MouseStatus.SUCCESSFUL:
-                            stats_info_global["mice successful"] += 1
-                        elif mousei.status is mouse.MouseStatus.CRASHED:
-                            stats_info_global["mice crashed"] += 1
-                        elif mousei.status is mouse.MouseStatus.SPUNOUT:
-                            stats_info_global["mice spun out"] += 1
-                        elif mousei.status is mouse.MouseStatus.TIMEDOUT:
-                            stats_info_global["mice timed out"] += 1
-                        elif mousei.status is mouse.MouseStatus.POTTERING:
-                            stats_info_global["mice pottering"] += 1
-                        continue
-
-            # the trail is drawn to its surface (but not necessarily rendered) on every frame
-            mouse_drawer.draw_mouse_trail(
-                mousei.position_rounded, mousei.speed, mousei.speed_max
-            )
-            if mousei.status is mouse.MouseStatus.HUNTING:
-                mice_hunting += 1
-
-                # only draw 1 hunting mouse per frame
-                if draw_frame and not mouse_drawn:
-                    mouse_drawer.draw_mouse(
-                        mousei.status,
-                        mousei.position_rounded,
-                        mousei.direction_radians,
-                        mousei.visited_alpha,
-                        mousei.whiskers,
-                    )
-                    mouse_drawn = True
-
-        stats_info_global["mice hunting"] = mice_hunting
-
-        if draw_frame:
-            stats.stats_update(stats_surface, {}, stats_info_global)
-            pygame.display.flip()
-            screen.blit(background, (0, 0))
-            screen.blit(maze_path_surface, (0, 0))
-            screen.blit(mouse_drawer.visited_by_mouse_screen, (0, 0))
-            screen.blit(mouse_drawer.maze_wall_distances_screen, (0, 0))
-            mouse_drawer.mouse_icon_group.draw(screen)
-            screen.blit(stats_surface, (0, 0))
-            pygame.display.update()
-
-        if mice_hunting == 0:
-            break
-        # clock.tick(400)
+            maze_simulation.run()
+        outcome_counts = maze_simulation.outcome_counts()
+        timer = maze_simulation.timer
+
+    if timer is not None:
+        write_record(
+            config.PHASE_TIMINGS_FILE,
+            timer.get_record(generation, time.perf_counter() - start_time),
+        )
 
+    if config.HEADLESS:
+        print(", ".join(f"{key}: {value}" for key, value in outcome_counts.items()))
 
-def run_neat(config):
+
+def run_neat(neat_config):
     global generation
+    global evaluator
+    global prefetcher
+    global publisher
+    global maze_rng
+    global direction_rng
+    maze_rng, direction_rng = seed_rngs(config.SEED)
     # p = neat.Checkpointer.restore_checkpoint('neat-checkpoint-85')
-    p = neat.Population(config)
+    p = neat.Population(neat_config)
     if CHECKPOINT_FILE_TO_LOAD is not None:
-        with gzip.open(CHECKPOINT_FILE_TO_LOAD) as f:
-            generation, loaded_config, population, species_set, rndstate = pickle.load(
-                f
-            )
-            random.setstate(rndstate)
-            p = neat.Population(config, (population, species_set, generation))
+        generation, loaded_config, population, species_set, rndstate, rng_states = (
+            load_checkpoint(CHECKPOINT_FILE_TO_LOAD)
+        )
+        random.setstate(rndstate)
+        if rng_states is not None:
+            maze_rng.bit_generator.state = rng_states["maze"]
+            direction_rng.bit_generator.state = rng_states["direction"]
+        p = neat.Population(neat_config, (population, species_set, generation))
 
     p.add_reporter(neat.StdOutReporter(True))
     stats = neat.StatisticsReporter()
     p.add_reporter(stats)
-    p.add_reporter(neat.Checkpointer(generation_interval=1))
+
+    # snapshots are taken of a simulation in this process, so only use workers when
+    # nothing is being served. The workers are forked before the checkpointer and
+    # the prefetcher start their threads, as a fork only copies the thread doing it
+    # and any locks the others hold would stay held in the workers
+    serve = config.SERVE_SNAPSHOTS or not config.HEADLESS
+    if not serve and config.EVALUATION_WORKERS > 1:
+        evaluator = ParallelEvaluator(
+            config.EVALUATION_WORKERS, neat_config, config.EVALUATION_BATCH_SIZE
+        )
+
+    if config.CHECKPOINT_STORE:
+        checkpointer = DeltaCheckpointer(
+            config.CHECKPOINT_GENERATION_INTERVAL,
+            config.CHECKPOINT_TIME_INTERVAL_SECONDS,
+            config.CHECKPOINT_FILENAME_PREFIX,
+            config.CHECKPOINT_STORE_KEEP_LAST,
+            config.CHECKPOINT_DIRECTORY,
+            get_rng_states=get_rng_states,
+        )
+    else:
+        checkpointer = BackgroundCheckpointer(
+            config.CHECKPOINT_GENERATION_INTERVAL,
+            config.CHECKPOINT_TIME_INTERVAL_SECONDS,
+            config.CHECKPOINT_FILENAME_PREFIX,
+            config.CHECKPOINT_KEEP_LAST,
+            get_rng_states=get_rng_states,
+        )
+    p.add_reporter(checkpointer)
+
+    if config.MAZE_PREFETCH_COUNT > 0:
+        prefetcher = MazePrefetcher(
+            config.MAZE_PREFETCH_COUNT * config.MAZES_PER_GENERATION, maze_rng
+        )
+
+    if serve:
+        publisher = SnapshotPublisher()
+    if not config.HEADLESS:
+        start_viewer()
 
     winner = p.run(run_maze, 10000)
+    checkpointer.close()
+    if publisher is not None:
+        publisher.close()
+    if prefetcher is not None:
+        prefetcher.close()
+    if evaluator is not None:
+        evaluator.close()
     with open("best.pickle", "wb") as f:
         pickle.dump(winner, f)
     print("done")
 
 
+def seed_rngs(seed):
+    """seed the randomness of a run. Returns numpy Generators for the mazes and for
+    the mice's starting directions, and seeds the random module, which neat-python
+    uses, each from its own part of the seed. If seed is None, one is picked.
+    Either way it's printed, so the run can be repeated. Loading a checkpoint
+    restores the states from then, rather than from the seed (see get_rng_states)"""
+    seed_sequence = np.random.SeedSequence(seed)
+    print(f"seed: {seed_sequence.entropy}")
+    maze_seed, direction_seed, neat_seed = seed_sequence.spawn(3)
+    random.seed(int(neat_seed.generate_state(1, np.uint64)[0]))
+    return np.random.default_rng(maze_seed), np.random.default_rng(direction_seed)
+
+
+def get_rng_states():
+    """the states of the run's numpy Generators, as of the mazes and starting
+    directions used so far, to be saved in checkpoints"""
+    if prefetcher is not None:
+        maze_rng_state = prefetcher.rng_state
+    else:
+        maze_rng_state = maze_rng.bit_generator.state
+    return {"maze": maze_rng_state, "direction": direction_rng.bit_generator.state}
+
+
+def start_viewer():
+    """draw the simulation in a process of its own. It's spawned rather than forked,
+    so pygame is only ever imported in there. A spawned process imports config
+    afresh, so it's given the settings it needs"""
+    multiprocessing.get_context("spawn").Process(
+        target=run_viewer,
+        args=(config.VIEWER_ADDRESS, config.PHASE_TIMINGS),
+        name="viewer",
+        daemon=True,
+    ).start()
+
+
+def run_viewer(address, phase_timings):
+    """the viewer process. See viewer.py"""
+    # pygame is only imported when there is something to draw
+    import viewer
+
+    viewer.run_viewer(address, wait=10, phase_timings=phase_timings)
+
+
 # define a main function
 def main():
     """main function"""
 
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run without a display; pygame is never imported",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve snapshots to a viewer even when headless (see viewer.py)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=config.VIEWER_ADDRESS[1],
+        help="the port to serve snapshots to a viewer on",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=config.SEED,
+        help="the seed for the run's randomness, so that it can be repeated",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="write how long each phase of each generation takes (see phase_timer.py)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.EVALUATION_WORKERS,
+        help="number of processes to evaluate genomes on when headless",
+    )
+    args = parser.parse_args()
+    if args.headless:
+        config.HEADLESS = True
+    if args.serve:
+        config.SERVE_SNAPSHOTS = True
+    config.VIEWER_ADDRESS = (config.VIEWER_ADDRESS[0], args.port)
+    if args.timings:
+        config.PHASE_TIMINGS = True
+    config.EVALUATION_WORKERS = args.workers
+    config.SEED = args.seed
+
     local_dir = os.path.dirname(__file__)
     config_file = os.path.join(local_dir, "maze_mouse_neat.config")
     neat_config = neat.Config(
@@ -1,8 +1,8 @@
-import time
-
 import numpy as np
 
 from backtracking import Backtracking
+from maze_corpus import MazeCorpus
+from maze_solver import MazeSolver
 
 
 class Maze:
@@ -10,58 +10,118 @@ class Maze:
     Wiht the Backtracking algorithm, the start point for creating the maze
     is chosen randomly but every part of the generated maze can be visited
     from any other and the corners are always free,
-    so the top left is the start and the bottom right is the end"""
+    so the top left is the start and the bottom right is the end.
+    If make_maze_big is False, maze_big isn't made and the mice look up walls in
+    maze_tiny instead (see get_walls)"""
 
-    def __init__(self, rows, cols, square_size, maze_directory) -> None:
+    def __init__(
+        self, rows, cols, square_size, maze_directory, make_maze_big=True
+    ) -> None:
         self.rows = rows
         self.cols = cols
         self.square_size = square_size
         self.maze_directory = maze_directory
+        self.make_maze_big = make_maze_big
         self.maze_title = None
         self.maze_tiny = []
         self.maze_big = []
         self.from_saved = None
         self.file_name = None
+        self.saved_number = None
+        self.is_solved = None
         self.path_distance = None
+        self.distance_score = None
+        self.path = None
+        self.distance_to_exit = None
+        self.on_path = None
+        self.wall_distance_table = None
 
-    def create(self):
-        """create a new maze"""
+    def create(self, rng=None):
+        """create a new maze. rng is a numpy Generator; see Backtracking"""
         self.maze_title = "New maze"
         self.from_saved = False
-        self.maze_tiny = self.get_new_maze(self.rows, self.cols)
-        self.maze_big = self.get_big_bool_maze(self.maze_tiny, self.square_size)
+        self.maze_tiny = self.get_new_maze(self.rows, self.cols, rng)
+        if self.make_maze_big:
+            self.maze_big = self.get_big_bool_maze(self.maze_tiny, self.square_size)
+
+    def solve(self):
+        """find the path from the start to the end of the maze. See MazeSolver"""
+        maze_solver = MazeSolver(self.maze_tiny)
+        (
+            self.is_solved,
+            self.path_distance,
+            self.distance_score,
+            self.path,
+        ) = maze_solver.solve_maze()
+        self.distance_to_exit = maze_solver.distance_to_exit
+        self.on_path = maze_solver.on_path
 
     def save(self, save_reason):
-        """save a maze. It will save to a folder based on the height and width of the
-        maze. The file name will include the reason the file was saved, the date/time
-        and the length of the path"""
-        filename = "maze.txt"
-        timestr = time.strftime("%Y%m%d-%H%M%S")
-        filename = self.maze_directory + "maze_" + save_reason + "_" + timestr
-        if self.path_distance is not None:
-            filename += "_path-" + str(self.path_distance)
-        filename += ".txt"
-        np.savetxt(filename, self.maze_tiny, fmt="%s")
-        self.file_name = filename
+        """save a maze to the corpus in maze_directory, which is based on the height
+        and width of the maze. The corpus records the reason the maze was saved,
+        the date/time and the length of the path. See MazeCorpus"""
+        corpus = MazeCorpus(self.maze_directory)
+        self.saved_number = corpus.append(
+            self.maze_tiny, self.path_distance, save_reason
+        )
+        self.file_name = corpus.mazes_file
+
+    def load(self, number):
+        """load a previously saved maze by its number in the corpus"""
+        corpus = MazeCorpus(self.maze_directory)
+        self.set_saved(corpus, number, corpus.get(number))
 
-    def load(self, filename):
-        """load a previously saved maze"""
-        self.maze_title = "Maze: " + filename
+    def load_sample(self, count, rng=None):
+        """load count mazes picked at random from the corpus, as new Mazes the same
+        size as this one. rng is a numpy Generator"""
+        corpus = MazeCorpus(self.maze_directory)
+        numbers, mazes_tiny = corpus.sample(count, rng)
+        mazes = []
+        for number, maze_tiny in zip(numbers, mazes_tiny):
+            maze1 = Maze(
+                self.rows,
+                self.cols,
+                self.square_size,
+                self.maze_directory,
+                self.make_maze_big,
+            )
+            maze1.set_saved(corpus, number, maze_tiny)
+            mazes.append(maze1)
+        return mazes
+
+    def set_saved(self, corpus, number, maze_tiny):
+        """use a maze loaded from a corpus"""
+        self.maze_title = f"Maze: {number}"
         self.from_saved = True
-        self.file_name = filename
-        self.maze_tiny = np.loadtxt(filename, dtype=int)
-        self.maze_big = self.get_big_bool_maze(self.maze_tiny, self.square_size)
+        self.file_name = corpus.mazes_file
+        self.saved_number = int(number)
+        self.maze_tiny = maze_tiny
+        if self.make_maze_big:
+            self.maze_big = self.get_big_bool_maze(self.maze_tiny, self.square_size)
+
+    def get_walls(self):
+        """the passages of the maze as a bool array indexed [y, x], and how many pixels
+        wide each element is. Pixel (x, y) is on a passage if
+        walls[y // scale, x // scale] is True. This is maze_big with a scale of 1
+        if it was made, otherwise maze_tiny with a scale of square_size, which
+        is the same maze in a much smaller array"""
+        if self.make_maze_big:
+            return self.maze_big, 1
+        return np.asarray(self.maze_tiny) != 0, self.square_size
 
     @staticmethod
-    def get_new_maze(rows, cols):
+    def get_new_maze(rows, cols, rng=None):
         """get a new maze"""
-        backtracking = Backtracking(height=rows + 1, width=cols + 1)
-        maze = backtracking.create_maze()
-        # remove the outer elements of the array
-        maze = np.delete(maze, [0, maze.shape[0] - 1], axis=0)
-        maze = np.delete(maze, [0, maze.shape[1] - 1], axis=1)
+        return Maze.get_new_mazes(rows, cols, 1, rng)[0]
 
-        return maze
+    @staticmethod
+    def get_new_mazes(rows, cols, count, rng=None):
+        """get count new mazes as an array of shape (count, rows, cols).
+        rng is a numpy Generator; see Backtracking"""
+        backtracking = Backtracking(height=rows + 1, width=cols + 1, rng=rng)
+        mazes = backtracking.create_mazes(count)
+        # remove the outer elements of the arrays
+        return mazes[:, 1:-1, 1:-1]
 
     @staticmethod
     def get_big_bool_maze(tiny_maze, scale_factor):
@@ -0,0 +1,141 @@
+"""
+A store for large numbers of saved mazes of one size, in a directory:
+    mazes.bin holds the maze_tiny arrays, each bit-packed into a fixed size record
+    index.bin holds a record for each maze (see INDEX_DTYPE)
+Both files are only ever appended to and are read through memory maps, so any
+maze can be loaded without reading the others and many can be loaded at once.
+A maze is written to mazes.bin before its index record, so the mazes in the
+corpus are the ones in the index. Anything left at the end of either file by an
+append that was interrupted is cut off by the next append.
+"""
+
+import os
+import time
+
+import numpy as np
+
+MAZES_FILE = "mazes.bin"
+INDEX_FILE = "index.bin"
+# the size of the maze, the length of the shortest path through it
+# (-1 if it wasn't solved), why it was saved and when (seconds since the epoch)
+INDEX_DTYPE = np.dtype(
+    [
+        ("rows", "<u2"),
+        ("cols", "<u2"),
+        ("path_distance", "<i4"),
+        ("reason", "S24"),
+        ("timestamp", "<f8"),
+    ]
+)
+
+
+class MazeCorpus:
+    """the mazes saved in a directory. Mazes are numbered from 0 in the order
+    they were saved. All the mazes in a corpus must be the same size"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.mazes_file = os.path.join(directory, MAZES_FILE)
+        self.index_file = os.path.join(directory, INDEX_FILE)
+        self._index = None
+        self._mazes = None
+
+    def __len__(self):
+        if not os.path.exists(self.index_file):
+            return 0
+        return os.path.getsize(self.index_file) // INDEX_DTYPE.itemsize
+
+    @property
+    def index(self):
+        """the index records of all the mazes, as a read-only array"""
+        if self._index is None or len(self._index) != len(self):
+            self._index = self.map_file(self.index_file, INDEX_DTYPE, (len(self),))
+        return self._index
+
+    @property
+    def shape(self):
+        """the shape of the maze_tiny arrays in the corpus"""
+        if len(self) == 0:
+            return None
+        return int(self.index[0]["rows"]), int(self.index[0]["cols"])
+
+    def append(self, maze_tiny, path_distance, reason, timestamp=None):
+        """save a maze at the end of the corpus and return its number"""
+        maze_tiny = np.asarray(maze_tiny)
+        if self.shape is not None and maze_tiny.shape != self.shape:
+            raise ValueError(
+                f"can't add a {maze_tiny.shape} maze to a corpus of {self.shape} mazes"
+            )
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record["rows"], record["cols"] = maze_tiny.shape
+        record["path_distance"] = -1 if path_distance is None else path_distance
+        record["reason"] = reason.encode()[: INDEX_DTYPE["reason"].itemsize]
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+
+        os.makedirs(self.directory, exist_ok=True)
+        number = self.truncate(self.get_record_size(maze_tiny.shape))
+        with open(self.mazes_file, "ab") as f:
+            f.write(np.packbits(maze_tiny != 0).tobytes())
+        with open(self.index_file, "ab") as f:
+            f.write(record.tobytes())
+        return number
+
+    def truncate(self, record_size):
+        """cut the files down to the mazes that have both a maze record and an
+        index record, dropping what an interrupted append left. Returns how many
+        mazes there are"""
+        count = len(self)
+        if os.path.exists(self.mazes_file):
+            count = min(count, os.path.getsize(self.mazes_file) // record_size)
+        else:
+            count = 0
+        for file_name, size in (
+            (self.index_file, INDEX_DTYPE.itemsize),
+            (self.mazes_file, record_size),
+        ):
+            if os.path.exists(file_name) and os.path.getsize(file_name) > count * size:
+                with open(file_name, "r+b") as f:
+                    f.truncate(count * size)
+        return count
+
+    def get(self, number):
+        """the maze_tiny array of one maze"""
+        return self.get_many([number])[0]
+
+    def get_many(self, numbers):
+        """the maze_tiny arrays of some mazes, as an array of shape
+        (len(numbers), rows, cols)"""
+        rows, cols = self.shape
+        mazes = self.mazes()[np.asarray(numbers, dtype=np.int64)]
+        bits = np.unpackbits(mazes, axis=1, count=rows * cols)
+        return bits.reshape(-1, rows, cols).astype(np.int8)
+
+    def sample(self, count, rng=None, replace=False):
+        """pick count mazes at random. Returns their numbers and their maze_tiny
+        arrays. rng is a numpy Generator"""
+        if rng is None:
+            rng = np.random.default_rng()
+        numbers = rng.choice(len(self), size=count, replace=replace)
+        return numbers, self.get_many(numbers)
+
+    def mazes(self):
+        """the packed maze records, one row per maze, as a read-only array"""
+        record_size = self.get_record_size(self.shape)
+        if self._mazes is None or len(self._mazes) != len(self):
+            self._mazes = self.map_file(
+                self.mazes_file, np.uint8, (len(self), record_size)
+            )
+        return self._mazes
+
+    @staticmethod
+    def get_record_size(shape):
+        """the size in bytes of a packed maze of this shape"""
+        rows, cols = shape
+        return (rows * cols + 7) // 8
+
+    @staticmethod
+    def map_file(file_name, dtype, shape):
+        """memory map the start of a file read-only"""
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(file_name, dtype=dtype, mode="r", shape=shape)
@@ -1,11 +1,14 @@
+import numpy as np
 import pygame
 
 
 class MazeDrawer:
     """draw the maze with pygame and add graphical elements like the start and finish"""
 
-    def __init__(self, maze, window_size, maze_surface, maze_path_surface) -> None:
-        self.maze = maze
+    def __init__(
+        self, maze_shape, window_size, maze_surface, maze_path_surface
+    ) -> None:
+        self.rows, self.cols = maze_shape
         self.window_size = window_size
         self.maze_surface = maze_surface
         self.maze_path_surface = maze_path_surface
@@ -27,21 +30,16 @@ class MazeDrawer:
 
     def draw_maze(self, maze_tiny, wall_colour, passage_colour):
         """create a tiny maze with just one pixel per segment of the maze, then scale it up"""
-        surf = pygame.Surface((self.maze.cols, self.maze.rows))
-        surf.fill(wall_colour)  # BLACK
-        for i in range(0, maze_tiny.shape[1]):
-            for j in range(0, maze_tiny.shape[0]):
-                if maze_tiny[j][i] == 0:
-                    surf.set_at((i, j), passage_colour)
-
+        pixels = np.where(
+            (np.asarray(maze_tiny).T == 0)[:, :, np.newaxis],
+            np.array(passage_colour, dtype=np.uint8),
+            np.array(wall_colour, dtype=np.uint8),
+        )
+        surf = pygame.surfarray.make_surface(pixels)
         pygame.transform.scale(surf, self.window_size, self.maze_surface)
 
     def draw_shortest_path(self, maze_path):
-        surf = pygame.Surface((self.maze.cols, self.maze.rows))
-        for i in range(0, maze_path.shape[1]):
-            for j in range(0, maze_path.shape[0]):
-                path_colour_r = maze_path[j][i]
-                if path_colour_r > 0:
-                    path_colour = (path_colour_r, 0, 0)
-                    surf.set_at((i, j), path_colour)
+        pixels = np.zeros((self.cols, self.rows, 3), dtype=np.uint8)
+        pixels[:, :, 0] = np.maximum(np.asarray(maze_path).T, 0)
+        surf = pygame.surfarray.make_surface(pixels)
         pygame.transform.scale(surf, self.window_size, self.maze_path_surface)
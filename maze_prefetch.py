@@ -0,0 +1,74 @@
+"""
+Builds the mazes for the coming generations on a background thread, while the
+current generation is simulated and while neat-python breeds the next one, so a
+generation doesn't have to wait for its maze to be created and solved.
+"""
+
+import queue
+import random
+import threading
+
+import numpy as np
+
+import config
+import simulation
+
+
+class MazePrefetcher:
+    """a background thread that keeps up to count solved mazes ready.
+    The mazes come from their own numpy Generator, so which mazes are built doesn't
+    depend on when the thread runs. If rng is None, it's seeded from the random
+    module when the prefetcher is created. rng_state is the state of rng as of the
+    mazes that get has returned, rather than of the ones built ahead, so a run
+    that's carried on from a checkpoint gets the mazes it would have"""
+
+    def __init__(self, count=config.MAZE_PREFETCH_COUNT, rng=None):
+        if rng is None:
+            rng = np.random.default_rng(random.getrandbits(64))
+        self.rng = rng
+        self.rng_state = rng.bit_generator.state
+        self.mazes = queue.Queue(maxsize=count)
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(
+            target=self.build_mazes, name="maze prefetch", daemon=True
+        )
+        self.thread.start()
+
+    def build_mazes(self):
+        """keep the queue full until the prefetcher is closed. If building a maze
+        fails, the error is queued instead so that get raises it"""
+        while not self.stopping.is_set():
+            try:
+                maze1 = simulation.new_maze(self.rng)
+            except Exception as error:
+                self.put(error)
+                return
+            self.put((maze1, self.rng.bit_generator.state))
+
+    def put(self, item):
+        """queue an item, giving up if the prefetcher is closed while waiting"""
+        while not self.stopping.is_set():
+            try:
+                self.mazes.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def get(self):
+        """the next solved maze, waiting for it to be built if need be"""
+        item = self.mazes.get()
+        if isinstance(item, Exception):
+            raise item
+        maze1, self.rng_state = item
+        return maze1
+
+    def close(self):
+        """stop building mazes"""
+        self.stopping.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,63 +1,92 @@
 import numpy as np
+from numba import njit
 
 
 class MazeSolver:
-    """solve the maze
-    based on https://www.101computing.net/backtracking-maze-path-finder/
+    """solve the maze with a breadth-first search from the start and another from
+    the end. There's no recursion, so it works for mazes of any size, and it takes
+    time in proportion to the number of squares in the maze.
+    After solve_maze:
+        distance_to_exit is how many squares each passage square is from the end
+        (-1 for walls and anything that can't reach the end)
+        on_path is True for the squares on a shortest path from start to end
     """
 
     def __init__(self, maze_tiny) -> None:
         self.maze_tiny = maze_tiny
+        self.distance_to_exit = None
+        self.on_path = None
 
     def solve_maze(self):
         """
-        maze_tiny has walls=0 and paths=1. change this to:
-        walls = -1
-        paths = 0
-        end = -2
-        shortest path will then count up from 1
+        maze_tiny has walls=0 and paths=1. The start is the top left square inside
+        the border and the end is the bottom right. Returns:
+            whether the maze can be solved
+            the length of the shortest path from start to end
+            an array that counts up from 1 at the start along the shortest path
+            and is 0 everywhere else
+            the same array scaled for drawing, with the path from 100 to 255
         """
-        maze = self.maze_tiny
-        rows = len(maze)
-        cols = len(maze[0])
-        maze = maze - 1
-        maze[rows - 2][cols - 2] = -2
-        solved = self.explore_maze(maze, 1, 1, 1)
-
-        min_path_distance = 0
+        passages = np.asarray(self.maze_tiny) != 0
+        rows, cols = passages.shape
+        end_row, end_col = rows - 2, cols - 2
+
+        distance_from_start = get_distances(passages, 1, 1)
+        self.distance_to_exit = get_distances(passages, end_row, end_col)
+        min_path_distance = int(distance_from_start[end_row, end_col])
+        solved = min_path_distance >= 0
+
         maze_path = None
         if solved:
-            min_path_distance = int(np.max(maze))
-            # change negative values to 0
-            maze[maze < 0] = 0
+            # a square is on a shortest path if going through it is no longer
+            self.on_path = (distance_from_start >= 0) & (
+                distance_from_start + self.distance_to_exit == min_path_distance
+            )
+            maze = np.where(self.on_path, distance_from_start + 1, 0)
+            maze[end_row, end_col] = 0
             # scale the array values 100 to 255
             maze_path = np.trunc(maze * 155 / min_path_distance)
             maze_path[maze_path > 0] += 100
+        else:
+            self.on_path = np.zeros(passages.shape, dtype=bool)
+            maze = np.zeros(passages.shape, dtype=np.int64)
+            min_path_distance = 0
 
         return solved, min_path_distance, maze, maze_path
 
-    # A backtracking/recursive function to check all possible paths until the exit is
-    def explore_maze(self, maze, row, col, distance):
-        if maze[row][col] == -2:
-            # We found the exit
-            return True
-        elif maze[row][col] == 0:  # Empty path, not explored
-            maze[row][col] = distance
-            if row < len(maze) - 1:
-                # Explore path below
-                if self.explore_maze(maze, row + 1, col, distance + 1):
-                    return True
-            if row > 0:
-                # Explore path above
-                if self.explore_maze(maze, row - 1, col, distance + 1):
-                    return True
-            if col < len(maze[row]) - 1:
-                # Explore path to the right
-                if self.explore_maze(maze, row, col + 1, distance + 1):
-                    return True
-            if col > 0:
-                # Explore path to the left
-                if self.explore_maze(maze, row, col - 1, distance + 1):
-                    return True
-            # Backtrack
-            maze[row][col] = -3
+
+@njit(cache=True, nogil=True)
+def get_distances(passages, start_row, start_col):
+    """breadth-first search from one square to get how many squares away every
+    passage is from it. Walls, and passages that can't be reached, are -1"""
+    rows, cols = passages.shape
+    distances = np.full((rows, cols), -1, dtype=np.int64)
+    if not passages[start_row, start_col]:
+        return distances
+
+    # every square is added to the queue at most once
+    queue_rows = np.empty(rows * cols, dtype=np.int64)
+    queue_cols = np.empty(rows * cols, dtype=np.int64)
+    queue_rows[0] = start_row
+    queue_cols[0] = start_col
+    distances[start_row, start_col] = 0
+    queue_start = 0
+    queue_end = 1
+    while queue_start < queue_end:
+        row = queue_rows[queue_start]
+        col = queue_cols[queue_start]
+        queue_start += 1
+        for row_delta, col_delta in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            next_row = row + row_delta
+            next_col = col + col_delta
+            if (
+                0 <= next_row < rows
+                and 0 <= next_col < cols
+                and passages[next_row, next_col]
+                and distances[next_row, next_col] < 0
+            ):
+                distances[next_row, next_col] = distances[row, col] + 1
+                queue_rows[queue_end] = next_row
+                queue_cols[queue_end] = next_col
+                queue_end += 1
+    return distances
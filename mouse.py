@@ -2,10 +2,10 @@ import math
 from enum import Enum, auto
 
 import numpy as np
-import pygame
 from numba import jit
 
 import config
+from visited_map import VisitedMaps, get_visited_alpha
 
 # Mice can only look so far ahead. Needs to be larger than grid size for the maze
 MOUSE_VISION_DISTANCE = round(1.2 * config.MAZE_SQUARE_SIZE)
@@ -44,6 +44,10 @@ OPTIMISE_MOUSE_FRAMES_BETWEEN_BLURRING_VISITED = (
 ) // 10
 
 
+# a Mouse keeps its records of where it has been in a VisitedMaps of its own
+MOUSE_INDEX = np.zeros(1, dtype=np.int64)
+
+
 class MouseStatus(Enum):
     """statuses that a mouse can have when hunting to find the end of a maze"""
 
@@ -53,6 +57,7 @@ class MouseStatus(Enum):
     TIMEDOUT = auto()
     SPUNOUT = auto()
     POTTERING = auto()
+    PRUNED = auto()
 
 
 class Mouse:
@@ -61,16 +66,18 @@ class Mouse:
     def __init__(
         self,
         window_size,
-        maze_big,
+        walls,
         maze_min_path_distance,
         maze_distance_score,
         max_distance,
         direction_radians,
+        walls_scale=1,
     ):
         self.window_size = window_size
-        self.maze_big = (
-            maze_big  # when accessing an element of maze_big, it's maze_big[y][x]
-        )
+        # pixel (x, y) is on a passage if walls[y // walls_scale][x // walls_scale].
+        # See Maze.get_walls
+        self.walls = walls
+        self.walls_scale = walls_scale
         self.maze_min_path_distance = maze_min_path_distance
         self.maze_distance_score = maze_distance_score
         self.max_distance = max_distance
@@ -108,7 +115,7 @@ class Mouse:
         # maze that's generated but this is fine
         self.steering_radians = 0
         self.position_previous_rounded = self.position_rounded
-        self.visited_alpha = np.zeros(window_size, dtype=np.float32)
+        self.visited_map = VisitedMaps(1, window_size)
         self.maze_wall_distances = None
         self.whiskers = None
 
@@ -262,8 +269,12 @@ class Mouse:
         # check how far away the wall is when going in the new direction
         # and alter the speed based on the distance
         (maze_wall_distance, _, _, _, _,) = self.get_maze_wall_distance(
-            self.maze_big,
-            self.visited_alpha,
+            self.walls,
+            self.walls_scale,
+            self.visited_map.tiles,
+            self.visited_map.tile_index,
+            self.visited_map.tile_fades,
+            self.visited_map.fades,
             self.direction_radians,
             self.position_rounded[0],
             self.position_rounded[1],
@@ -274,7 +285,7 @@ class Mouse:
 
         return new_steering_radians, speed_delta
 
-    def move_scaled(self, draw_frame, new_steering_radians_scaled, speed_delta_scaled):
+    def move_scaled(self, new_steering_radians_scaled, speed_delta_scaled):
         new_steering_radians = (
             new_steering_radians_scaled * MOUSE_STEERING_RADIANS_DELTA_MAX
         )
@@ -287,9 +298,9 @@ class Mouse:
             + MOUSE_ACCELERATION_MIN
             + MOUSE_ACCELERATION_MAX
         ) / 2.0
-        self.move(draw_frame, new_steering_radians, speed_delta)
+        self.move(new_steering_radians, speed_delta)
 
-    def move(self, draw_frame, new_steering_radians, speed_delta):
+    def move(self, new_steering_radians, speed_delta):
         if self.status is not MouseStatus.HUNTING:
             return
 
@@ -336,16 +347,10 @@ class Mouse:
         if self.position_tiny not in self.cells_visited:
             self.cells_visited.add(self.position_tiny)
 
-        if draw_frame:
-            pygame.display.update(
-                pygame.Rect(self.position_rounded[0], self.position_rounded[1], 1, 1)
-            )
-            pygame.display.update()
-
         self.update_visited(
             self.position,
             self.direction_radians,
-            self.visited_alpha,
+            self.visited_map,
             self.trail_circle_alpha,
             self.visited_path_radius,
         )
@@ -371,7 +376,7 @@ class Mouse:
         """
 
         if self.frames % self.frames_between_blurring_visited == 0:
-            self.fade_visited(self.visited_alpha)
+            self.fade_visited(self.visited_map)
 
         # decided that the mouse has "crashed" if it has taken more than this
         # distance to complete the maze - better to create a "crashed" status
@@ -470,46 +475,30 @@ class Mouse:
         return new_steering_radians
 
     @staticmethod
-    @jit(nopython=True)
     def update_visited(
         position,
         direction_radians,
-        visited_alpha,
+        visited_map,
         trail_circle_alpha,
         visited_path_radius,
     ):
-        """Updates a mouses 2D array to record that the mouse has been
+        """Updates a mouses VisitedMaps to record that the mouse has been
         in a particular area"""
-        # update a 2d numpy array that represents visited pixels.
-        # it should add a circular array behind itself.
-        # needs to know the angle of travel
-        # needs to add but only to a level of saturation (max 255)
-        circle_top_left_x = round(
-            position[0]
-            - visited_path_radius * math.cos(direction_radians)
-            - visited_path_radius
+        # add a circular array behind the mouse, to a level of saturation (max 255).
+        # the tiles it covers are allocated the first time
+        visited_map.update_visited(
+            MOUSE_INDEX,
+            np.array([position]),
+            np.array([direction_radians]),
+            trail_circle_alpha,
+            visited_path_radius,
         )
-        circle_top_left_y = round(
-            position[1]
-            - visited_path_radius * math.sin(direction_radians)
-            - visited_path_radius
-        )
-        # https://stackoverflow.com/questions/9886303/adding-different-sized-shaped-displaced-numpy-matrices
-        section_to_update = visited_alpha[
-            circle_top_left_x : circle_top_left_x + 2 * visited_path_radius,
-            circle_top_left_y : circle_top_left_y + 2 * visited_path_radius,
-        ]
-        section_to_update += trail_circle_alpha  # use array slicing
-        # section_to_update[section_to_update > 255] = 255 -- this doesn't work. No idea why
-        np.clip(section_to_update, 0, 255, out=section_to_update)
 
     @staticmethod
-    # @jit(nopython=True)
-    def fade_visited(visited_alpha):
-        """fades the mouses 2D array of records of where it has been - like
+    def fade_visited(visited_map):
+        """fades the mouses records of where it has been - like
         a scent fading away"""
-        # subtract from the alpha channel but stop it going below zero
-        visited_alpha[visited_alpha >= 0] *= 0.99
+        visited_map.fade_visited(MOUSE_INDEX)
         return
 
     @staticmethod
@@ -560,9 +549,9 @@ class Mouse:
     def get_maze_wall_distances(self):
         """get the distance of the mouse from the edges of the maze along
         a defined list of angles from its direction of travel"""
-        mouse_in_maze_passage = self.maze_big[self.position_rounded[1]][
-            self.position_rounded[0]
-        ]
+        mouse_in_maze_passage = self.walls[
+            self.position_rounded[1] // self.walls_scale
+        ][self.position_rounded[0] // self.walls_scale]
         if not mouse_in_maze_passage:
             self.status = MouseStatus.CRASHED
             self.update_score()
@@ -579,8 +568,12 @@ class Mouse:
                 edge_x,
                 edge_y,
             ) = self.get_maze_wall_distance(
-                self.maze_big,
-                self.visited_alpha,
+                self.walls,
+                self.walls_scale,
+                self.visited_map.tiles,
+                self.visited_map.tile_index,
+                self.visited_map.tile_fades,
+                self.visited_map.fades,
                 self.direction_radians,
                 self.position_rounded[0],
                 self.position_rounded[1],
@@ -605,8 +598,12 @@ class Mouse:
     @staticmethod
     @jit(nopython=True)
     def get_maze_wall_distance(
-        maze_big,
-        visited_alpha,
+        walls,
+        walls_scale,
+        visited_tiles,
+        visited_tile_index,
+        visited_tile_fades,
+        visited_fades,
         direction_radians,
         position_rounded_x,
         position_rounded_y,
@@ -634,10 +631,18 @@ class Mouse:
             # improves performance of this function by ~5% and by ~3% overall
             test_x_round = round(test_x)
             test_y_round = round(test_y)
-            if maze_big[test_y_round][test_x_round] is False:
+            if not walls[test_y_round // walls_scale][test_x_round // walls_scale]:
                 break
 
-            visited_alpha_pixel = visited_alpha[test_x_round, test_y_round]
+            visited_alpha_pixel = get_visited_alpha(
+                visited_tiles,
+                visited_tile_index,
+                visited_tile_fades,
+                visited_fades,
+                0,
+                test_x_round,
+                test_y_round,
+            )
             visited_alpha_total += visited_alpha_pixel
             if visited_alpha_pixel > 0:
                 visited_count += 1
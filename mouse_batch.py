@@ -0,0 +1,271 @@
+import numpy as np
+
+import config
+import mouse_vision
+from mouse import (
+    MOUSE_ACCELERATION_MAX,
+    MOUSE_ACCELERATION_MIN,
+    MOUSE_MAX_SPIN_RADIANS,
+    MOUSE_STEERING_RADIANS_DELTA_MAX,
+    OPTIMISE_MOUSE_FRAMES_BETWEEN_BLURRING_VISITED,
+    OPTIMISE_MOUSE_SPEED_MAX_INITIAL,
+    OPTIMISE_MOUSE_SPEED_MIN_INITIAL,
+    OPTIMISE_MOUSE_VISION_ANGLES_AND_WEIGHTS,
+    OPTIMISE_MOUSE_VISITED_PATH_RADIUS,
+    Mouse,
+    MouseStatus,
+)
+from visited_map import VisitedMaps
+
+HUNTING = MouseStatus.HUNTING.value
+SUCCESSFUL = MouseStatus.SUCCESSFUL.value
+CRASHED = MouseStatus.CRASHED.value
+TIMEDOUT = MouseStatus.TIMEDOUT.value
+SPUNOUT = MouseStatus.SPUNOUT.value
+POTTERING = MouseStatus.POTTERING.value
+PRUNED = MouseStatus.PRUNED.value
+
+
+class MouseBatch:
+    """a population of mice that hunt in one or more mazes.
+    It does the same as a list of Mouse objects but the state of every mouse is
+    kept in numpy arrays, with one row per mouse, so that all of the hunting mice
+    can be moved on by a frame in one go. Methods that take idx only act on
+    those rows, which should all be hunting"""
+
+    def __init__(
+        self,
+        count,
+        window_size,
+        walls,
+        maze_min_path_distance,
+        maze_distance_score,
+        max_distance,
+        direction_radians,
+        walls_scale=1,
+        wall_distance_table=None,
+        maze_indexes=None,
+    ):
+        self.count = count
+        self.window_size = window_size
+        # the walls of each maze stacked into one array. In maze m, pixel (x, y)
+        # is on a passage if walls[m, y // walls_scale, x // walls_scale].
+        # See Maze.get_walls
+        self.walls = walls
+        self.walls_scale = walls_scale
+        # the tables of each maze stacked in the same way (see
+        # mouse_vision.get_wall_distance_table). Empty if there aren't any
+        if wall_distance_table is None:
+            wall_distance_table = np.zeros((0, 0, 0, 1), dtype=np.uint8)
+        self.wall_distance_table = wall_distance_table
+        # which maze each mouse is in
+        if maze_indexes is None:
+            maze_indexes = np.zeros(count, dtype=np.int64)
+        self.maze_indexes = maze_indexes
+        # one for each maze
+        self.maze_min_path_distance = maze_min_path_distance
+        self.maze_distance_score = maze_distance_score
+        self.max_distance = max_distance
+
+        self.visited_path_radius = OPTIMISE_MOUSE_VISITED_PATH_RADIUS
+        self.vision_angles = np.array(
+            [angle for angle, _ in OPTIMISE_MOUSE_VISION_ANGLES_AND_WEIGHTS]
+        )
+        self.frames_between_blurring_visited = (
+            OPTIMISE_MOUSE_FRAMES_BETWEEN_BLURRING_VISITED
+        )
+        self.trail_circle_alpha = Mouse.create_trail_circle_alpha(
+            self.visited_path_radius, 10
+        )
+
+        # starting position is in the middle of top left square inside the border
+        self.position = np.full((count, 2), config.MAZE_SQUARE_SIZE * 1.5)
+        self.position_rounded = np.rint(self.position).astype(np.int64)
+        self.direction_radians = np.full(count, float(direction_radians))
+        self.steering_radians = np.zeros(count)
+        self.speed = np.full(count, config.MAZE_SQUARE_SIZE / 50)  # pixels per frame
+        self.speed_min = np.full(count, OPTIMISE_MOUSE_SPEED_MIN_INITIAL)
+        self.speed_max = np.full(count, OPTIMISE_MOUSE_SPEED_MAX_INITIAL)
+        self.frames = np.zeros(count, dtype=np.int64)
+        self.distance_travelled = np.zeros(count)
+        self.status = np.full(count, HUNTING, dtype=np.int8)
+        self.score = np.zeros(count)
+
+        # position_tiny is rounded, so it can be one more than the last row or column
+        self.cells_visited = np.zeros(
+            (count, config.MAZE_ROWS + 1, config.MAZE_COLS + 1), dtype=bool
+        )
+        self.cells_visited_count = np.zeros(count, dtype=np.int64)
+        self.visited = VisitedMaps(count, window_size)
+
+        # what each mouse can see along each of its vision angles
+        angle_count = len(self.vision_angles)
+        self.maze_wall_distances = np.zeros((count, angle_count), dtype=np.int64)
+        self.visited_counts = np.zeros((count, angle_count), dtype=np.int64)
+        self.visited_alpha_totals = np.zeros((count, angle_count), dtype=np.float32)
+        self.whisker_ends = np.zeros((count, angle_count, 2), dtype=np.int64)
+        # the inputs to the neural networks - the same values as Mouse.get_data()
+        self.inputs = np.zeros((count, 1 + 3 * angle_count))
+
+    def hunting(self):
+        """indexes of the mice that are still hunting"""
+        return np.flatnonzero(self.status == HUNTING)
+
+    def get_maze_wall_distances(self, idx):
+        """crash any mice that have left the maze passages, then get the distance of the
+        rest from the edges of the maze along each vision angle. Returns the indexes of
+        the mice that are still hunting"""
+        in_maze_passage = self.walls[
+            self.maze_indexes[idx],
+            self.position_rounded[idx, 1] // self.walls_scale,
+            self.position_rounded[idx, 0] // self.walls_scale,
+        ]
+        self.finish(idx[~in_maze_passage], CRASHED)
+        idx = idx[in_maze_passage]
+
+        mouse_vision.get_maze_wall_distances(
+            self.walls,
+            self.walls_scale,
+            self.wall_distance_table,
+            self.maze_indexes,
+            self.visited.tiles,
+            self.visited.tile_index,
+            self.visited.tile_fades,
+            self.visited.fades,
+            self.position_rounded,
+            self.direction_radians,
+            idx,
+            self.vision_angles,
+            self.maze_wall_distances,
+            self.visited_counts,
+            self.visited_alpha_totals,
+            self.whisker_ends,
+        )
+
+        self.inputs[idx, 0] = self.speed[idx]
+        self.inputs[idx, 1::3] = self.maze_wall_distances[idx]
+        self.inputs[idx, 2::3] = self.visited_counts[idx]
+        self.inputs[idx, 3::3] = self.visited_alpha_totals[idx]
+
+        return idx
+
+    def move_scaled(self, idx, new_steering_radians_scaled, speed_delta_scaled):
+        """as Mouse.move_scaled"""
+        new_steering_radians = (
+            new_steering_radians_scaled * MOUSE_STEERING_RADIANS_DELTA_MAX
+        )
+        speed_delta = (
+            speed_delta_scaled * (MOUSE_ACCELERATION_MAX - MOUSE_ACCELERATION_MIN)
+            + MOUSE_ACCELERATION_MIN
+            + MOUSE_ACCELERATION_MAX
+        ) / 2.0
+        self.move(idx, new_steering_radians, speed_delta)
+
+    def move(self, idx, new_steering_radians, speed_delta):
+        """as Mouse.move, without the trail or the checks on the mouse's status"""
+        self.frames[idx] += 1
+
+        new_direction_radians = self.direction_radians[idx] + new_steering_radians
+        speed_delta = np.clip(speed_delta, MOUSE_ACCELERATION_MIN, MOUSE_ACCELERATION_MAX)
+        new_speed = np.minimum(
+            np.maximum(self.speed[idx] + speed_delta, self.speed_min[idx]),
+            self.speed_max[idx],
+        )
+
+        self.position[idx, 0] += new_speed * np.cos(new_direction_radians)
+        self.position[idx, 1] += new_speed * np.sin(new_direction_radians)
+        self.speed[idx] = new_speed
+        self.distance_travelled[idx] += new_speed
+        self.steering_radians[idx] = new_steering_radians
+        self.direction_radians[idx] = new_direction_radians
+
+        self.position_rounded[idx] = np.rint(self.position[idx])
+        position_tiny = np.rint(self.position[idx] / config.MAZE_SQUARE_SIZE).astype(
+            np.int64
+        )
+        cells = (idx, position_tiny[:, 1], position_tiny[:, 0])
+        self.cells_visited_count[idx] += ~self.cells_visited[cells]
+        self.cells_visited[cells] = True
+
+    def update_visited(self, idx):
+        """add to each mouse's record of where it has been"""
+        self.visited.update_visited(
+            idx,
+            self.position,
+            self.direction_radians,
+            self.trail_circle_alpha,
+            self.visited_path_radius,
+        )
+
+    def fade_visited(self, idx):
+        """fade the records of where the mice have been, every so many frames"""
+        self.visited.fade_visited(
+            idx[self.frames[idx] % self.frames_between_blurring_visited == 0]
+        )
+
+    def update_statuses(self, idx):
+        """stop the mice that have taken too long, won, spun out or are pottering,
+        checked in the same order as Mouse.move"""
+        position_x = self.position[idx, 0] / config.MAZE_SQUARE_SIZE - config.MAZE_COLS
+        position_y = self.position[idx, 1] / config.MAZE_SQUARE_SIZE - config.MAZE_ROWS
+        new_status = np.select(
+            [
+                self.distance_travelled[idx] > self.max_distance,
+                (-2 < position_x)
+                & (position_x < -1)
+                & (-2 < position_y)
+                & (position_y < -1),
+                np.abs(self.direction_radians[idx]) > MOUSE_MAX_SPIN_RADIANS,
+                self.cells_visited_count[idx]
+                < 0.5 * np.sqrt(self.frames[idx] / config.MAZE_SQUARE_SIZE),
+            ],
+            [TIMEDOUT, SUCCESSFUL, SPUNOUT, POTTERING],
+            HUNTING,
+        )
+        stopped = new_status != HUNTING
+        self.finish(idx[stopped], new_status[stopped])
+
+    def finish(self, idx, status):
+        """stop mice hunting and give them their scores, as Mouse.update_score"""
+        self.status[idx] = status
+        self.score[idx] = np.where(
+            self.status[idx] == SPUNOUT,
+            -1,
+            self.cells_visited_count[idx] ** 2 / (self.frames[idx] / 1000),
+        )
+
+    def get_score_bounds(self, idx):
+        """the best score that each mouse in idx could still stop hunting with.
+        A mouse gets to at most one new cell a frame and no more cells than there
+        are. A line one cell long can only reach 3 cells that aren't the cell it
+        starts in, so there's a limit on the new cells for how far the mouse can
+        go, which is speed_max a frame until it times out after max_distance.
+        The score is the best of these limits over the frames it has left"""
+        if len(idx) == 0:
+            return np.zeros(0)
+        cells_total = self.cells_visited[0].size
+        frames = self.frames[idx, np.newaxis]
+        cells = self.cells_visited_count[idx, np.newaxis]
+        speed_max = self.speed_max[idx, np.newaxis]
+        # it can go one more frame after reaching max_distance
+        distance_left = (
+            self.max_distance - self.distance_travelled[idx, np.newaxis] + speed_max
+        )
+        frames_left = np.floor(distance_left / self.speed_min[idx, np.newaxis])
+        frames_more = np.arange(1, max(2, int(frames_left.max()) + 1))
+        distance_more = np.minimum(frames_more * speed_max, distance_left)
+        best_cells = np.minimum(
+            np.minimum(cells + frames_more, cells_total),
+            cells + 3 * np.ceil(distance_more / config.MAZE_SQUARE_SIZE),
+        )
+        scores = best_cells**2 / ((frames + frames_more) / 1000)
+        scores[frames_more > np.maximum(frames_left, 1)] = 0
+        return scores.max(axis=1)
+
+    def whiskers(self, index):
+        """the lines from a mouse to the maze edges, as Mouse.whiskers"""
+        position_rounded = tuple(self.position_rounded[index])
+        whiskers = []
+        for whisker_end in self.whisker_ends[index]:
+            whiskers += [position_rounded, tuple(whisker_end)]
+        return whiskers
@@ -7,7 +7,8 @@ from mouse_icon import MouseIcon
 
 
 class MouseDrawer:
-    """draws a mouse"""
+    """draws a mouse. The rectangles of the screen that have changed are collected in
+    dirty_rects, for a Renderer (see take_dirty_rects)"""
 
     """
         *** fixed globals used in the MouseDrawer class ***
@@ -27,6 +28,8 @@ class MouseDrawer:
         self.visited_by_mouse_screen = visited_by_mouse_screen
         self.maze_wall_distances_screen = maze_wall_distances_screen
         self.position_rounded = None
+        self.dirty_rects = []
+        self.whiskers_rect = None
 
         self.mouse_icon = MouseIcon()
         self.mouse_icon_group = pygame.sprite.Group()
@@ -39,15 +42,52 @@ class MouseDrawer:
         mouse_speed_colour = round(200 * speed / speed_max)
         mouse_colour = (200 - mouse_speed_colour, mouse_speed_colour, 20)
         self.screen.set_at(position_rounded, mouse_colour)
+        self.dirty_rects.append(pygame.Rect(position_rounded, (1, 1)))
 
-    def draw_mouse(
-        self, status, position_rounded, direction_radians, visited_alpha, whiskers
-    ):
+    def draw_mouse_trails(self, positions, speed_colours):
+        """draw many trail points at once. positions is an (n, 2) array of (x, y) and
+        speed_colours the mouse speeds as 0 to 200 fractions of their top speeds,
+        as in draw_mouse_trail"""
+        width, height = self.screen.get_size()
+        x = positions[:, 0].astype(np.intp)
+        y = positions[:, 1].astype(np.intp)
+        on_screen = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x, y = x[on_screen], y[on_screen]
+        speed_colours = speed_colours[on_screen].astype(np.uint8)
+        pixels = pygame.surfarray.pixels3d(self.screen)
+        pixels[x, y, 0] = 200 - speed_colours
+        pixels[x, y, 1] = speed_colours
+        pixels[x, y, 2] = 20
+        # unlock the surface
+        del pixels
+
+        # mark the maze squares that have been drawn on, rather than every pixel
+        square_size = config.MAZE_SQUARE_SIZE
+        squares = np.unique(np.stack((x, y), axis=1) // square_size, axis=0)
+        for square_x, square_y in squares:
+            self.dirty_rects.append(
+                pygame.Rect(
+                    square_x * square_size,
+                    square_y * square_size,
+                    square_size,
+                    square_size,
+                )
+            )
+
+    def take_dirty_rects(self):
+        """the rectangles that have changed since this was last called"""
+        dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+        return dirty_rects
+
+    def draw_mouse(self, status, position_rounded, direction_radians, whiskers):
+        self.dirty_rects.append(self.mouse_icon.rect.copy())
         self.mouse_icon_group.update(
             position_rounded[0],
             position_rounded[1],
             direction_radians,
         )
+        self.dirty_rects.append(self.mouse_icon.rect.copy())
 
         if status is not MouseStatus.CRASHED:
             # if crashed into a corner, all whiskers might be zero length
@@ -61,16 +101,32 @@ class MouseDrawer:
         elif status is MouseStatus.CRASHED:
             self.draw_mouse_finish_location(config.RED)
 
+    def draw_visited_tiles(self, tile_size, tiles_xy, tiles_alpha, reset=False):
+        """copy tiles of a visited map (see VisitedMaps.take_changed_tiles) to the
+        alpha of its surface. If reset is True, the rest of the map is cleared"""
         # from https://github.com/pygame/pygame/issues/1244
         surface_alpha = np.array(self.visited_by_mouse_screen.get_view("A"), copy=False)
-        surface_alpha[:, :] = np.rint(visited_alpha)
+        if reset:
+            surface_alpha[:, :] = 0
+            self.dirty_rects.append(self.visited_by_mouse_screen.get_rect())
+        for (tile_x, tile_y), tile_alpha in zip(tiles_xy, tiles_alpha):
+            left = tile_x * tile_size
+            top = tile_y * tile_size
+            section = surface_alpha[left : left + tile_size, top : top + tile_size]
+            section[:, :] = tile_alpha[: section.shape[0], : section.shape[1]]
+            self.dirty_rects.append(
+                pygame.Rect(left, top, section.shape[0], section.shape[1])
+            )
 
     def draw_lines_to_maze_edge(self, whiskers):
         """draw lines from the mouse to the edge of the maze"""
-        self.maze_wall_distances_screen.fill((0, 0, 0, 0))
-        pygame.draw.lines(
+        if self.whiskers_rect is not None:
+            self.maze_wall_distances_screen.fill((0, 0, 0, 0), self.whiskers_rect)
+            self.dirty_rects.append(self.whiskers_rect)
+        self.whiskers_rect = pygame.draw.lines(
             self.maze_wall_distances_screen, config.BLACK, False, whiskers
         )
+        self.dirty_rects.append(self.whiskers_rect)
 
     def draw_mouse_finish_location(self, highlight_colour):
         """draw where the mouse finishes"""
@@ -86,4 +142,4 @@ class MouseDrawer:
             2 * finish_radius,
             2 * finish_radius,
         )
-        pygame.display.update(finish_zone)
+        self.dirty_rects.append(finish_zone)
@@ -0,0 +1,206 @@
+import math
+
+import numpy as np
+from numba import njit, prange
+
+from mouse import MOUSE_VISION_DISTANCE
+from visited_map import get_visited_alpha
+
+
+@njit(parallel=True, cache=True)
+def get_maze_wall_distances(
+    walls,
+    walls_scale,
+    wall_distance_table,
+    maze_indexes,
+    visited_tiles,
+    visited_tile_index,
+    visited_tile_fades,
+    visited_fades,
+    positions_rounded,
+    directions_radians,
+    idx,
+    vision_angles,
+    maze_wall_distances,
+    visited_counts,
+    visited_alpha_totals,
+    whisker_ends,
+):
+    """for each mouse in idx and each vision angle, follow a line from the mouse until
+    it is no longer on a maze passage or MOUSE_VISION_DISTANCE has been reached.
+    This does the same as Mouse.get_maze_wall_distance for every mouse in one call,
+    with the mice shared between cores. The results are written into rows of the
+    (mice x angles) output arrays. walls is the walls of each maze stacked into
+    one array (see Maze.get_walls for walls and walls_scale) and mouse i is in
+    maze maze_indexes[i]. If wall_distance_table isn't empty, how far away the wall
+    is comes from the maze's table (see get_wall_distance_table) and the line is
+    only followed to add up the visited trail"""
+    use_table = wall_distance_table.shape[0] > 0
+    headings = wall_distance_table.shape[3]
+    for i in prange(idx.shape[0]):
+        index = idx[i]
+        maze_walls = walls[maze_indexes[index]]
+        position_rounded_x = positions_rounded[index, 0]
+        position_rounded_y = positions_rounded[index, 1]
+        for angle_index in range(vision_angles.shape[0]):
+            search_angle_radians = (
+                directions_radians[index] + vision_angles[angle_index]
+            )
+            delta_x = math.cos(search_angle_radians)
+            delta_y = math.sin(search_angle_radians)
+
+            # the line is followed up to, but not including, this distance
+            distance_end = MOUSE_VISION_DISTANCE
+            if use_table:
+                heading = (
+                    round(search_angle_radians * headings / (2 * math.pi)) % headings
+                )
+                distance_end = wall_distance_table[
+                    maze_indexes[index], position_rounded_y, position_rounded_x, heading
+                ]
+
+            edge_distance = 0
+            visited_count = 0
+            visited_alpha_total = np.float32(0)
+            test_x_round = position_rounded_x
+            test_y_round = position_rounded_y
+
+            for distance in range(1, min(distance_end, MOUSE_VISION_DISTANCE)):
+                edge_distance = distance
+                test_x_round = round(position_rounded_x + distance * delta_x)
+                test_y_round = round(position_rounded_y + distance * delta_y)
+                if not use_table and not maze_walls[
+                    test_y_round // walls_scale, test_x_round // walls_scale
+                ]:
+                    break
+
+                visited_alpha_pixel = get_visited_alpha(
+                    visited_tiles,
+                    visited_tile_index,
+                    visited_tile_fades,
+                    visited_fades,
+                    index,
+                    test_x_round,
+                    test_y_round,
+                )
+                visited_alpha_total += visited_alpha_pixel
+                if visited_alpha_pixel > 0:
+                    visited_count += 1
+
+            if use_table:
+                # the point where the line reaches the wall, or the end of the line
+                edge_distance = min(distance_end, MOUSE_VISION_DISTANCE - 1)
+                test_x_round = round(position_rounded_x + edge_distance * delta_x)
+                test_y_round = round(position_rounded_y + edge_distance * delta_y)
+
+            maze_wall_distances[index, angle_index] = edge_distance
+            visited_counts[index, angle_index] = visited_count
+            visited_alpha_totals[index, angle_index] = visited_alpha_total
+            whisker_ends[index, angle_index, 0] = test_x_round
+            whisker_ends[index, angle_index, 1] = test_y_round
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def get_wall_distance_table(walls, walls_scale, headings):
+    """how far a mouse can see from each pixel of the maze in each of a number of
+    headings, as a uint8 array indexed [y, x, heading]. Heading h is an angle of
+    2 * pi * h / headings radians. The distance is the first step along the line
+    that isn't on a maze passage, stepping as get_maze_wall_distances does, or
+    MOUSE_VISION_DISTANCE if there isn't one that close. Pixels that aren't on a
+    passage are 0.
+    Rather than checking every step, it only checks the steps where the line
+    crosses into another element of walls.
+    The rows are shared between cores, so only call this from the main thread: the
+    parallel kernels of the simulation run there, and numba's workqueue threading
+    layer can't run parallel kernels from two threads at once. Other threads use
+    get_wall_distance_table_serial"""
+    table, deltas_x, deltas_y = new_wall_distance_table(walls, walls_scale, headings)
+    for y in prange(table.shape[0]):
+        fill_wall_distance_row(table, walls, walls_scale, deltas_x, deltas_y, y)
+    return table
+
+
+@njit(cache=True, nogil=True)
+def get_wall_distance_table_serial(walls, walls_scale, headings):
+    """get_wall_distance_table on one core, for threads other than the main one"""
+    table, deltas_x, deltas_y = new_wall_distance_table(walls, walls_scale, headings)
+    for y in range(table.shape[0]):
+        fill_wall_distance_row(table, walls, walls_scale, deltas_x, deltas_y, y)
+    return table
+
+
+@njit(cache=True, nogil=True)
+def new_wall_distance_table(walls, walls_scale, headings):
+    """an empty wall distance table for a maze, and the step along x and y for each
+    heading"""
+    height = walls.shape[0] * walls_scale
+    width = walls.shape[1] * walls_scale
+    deltas_x = np.empty(headings)
+    deltas_y = np.empty(headings)
+    for heading in range(headings):
+        deltas_x[heading] = math.cos(2 * math.pi * heading / headings)
+        deltas_y[heading] = math.sin(2 * math.pi * heading / headings)
+    table = np.zeros((height, width, headings), dtype=np.uint8)
+    return table, deltas_x, deltas_y
+
+
+@njit(cache=True, nogil=True)
+def fill_wall_distance_row(table, walls, walls_scale, deltas_x, deltas_y, y):
+    """fill in row y of a wall distance table"""
+    for x in range(table.shape[1]):
+        if not walls[y // walls_scale, x // walls_scale]:
+            continue
+        for heading in range(table.shape[2]):
+            delta_x = deltas_x[heading]
+            delta_y = deltas_y[heading]
+            wall_x = x // walls_scale
+            wall_y = y // walls_scale
+            wall_distance = MOUSE_VISION_DISTANCE
+            while True:
+                distance = min(
+                    get_crossing_step(x, delta_x, wall_x, walls_scale),
+                    get_crossing_step(y, delta_y, wall_y, walls_scale),
+                )
+                if distance >= MOUSE_VISION_DISTANCE:
+                    break
+                wall_x = round(x + distance * delta_x) // walls_scale
+                wall_y = round(y + distance * delta_y) // walls_scale
+                if not walls[wall_y, wall_x]:
+                    wall_distance = distance
+                    break
+            table[y, x, heading] = wall_distance
+
+
+@njit(cache=True, nogil=True)
+def get_crossing_step(start, delta, wall_index, walls_scale):
+    """the first step along a line, in one dimension, where round(start + step * delta)
+    is no longer in element wall_index of walls, or MOUSE_VISION_DISTANCE if it's
+    further than that. The rounded position moves one way, so the estimate can
+    be corrected by checking the steps next to it"""
+    if delta > 0:
+        boundary = (wall_index + 1) * walls_scale
+        edge = boundary - 0.5
+    elif delta < 0:
+        boundary = wall_index * walls_scale - 1
+        edge = boundary + 0.5
+    else:
+        return MOUSE_VISION_DISTANCE
+
+    step = max(1.0, min(math.ceil((edge - start) / delta), MOUSE_VISION_DISTANCE))
+    step = int(step)
+    while step > 1 and is_across(start + (step - 1) * delta, delta, boundary):
+        step -= 1
+    while step < MOUSE_VISION_DISTANCE and not is_across(
+        start + step * delta, delta, boundary
+    ):
+        step += 1
+    return step
+
+
+@njit(cache=True, nogil=True)
+def is_across(position, delta, boundary):
+    """whether a position along a line going in direction delta has rounded to
+    boundary or past it"""
+    if delta > 0:
+        return round(position) >= boundary
+    return round(position) <= boundary
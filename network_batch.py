@@ -0,0 +1,276 @@
+import math
+
+import numpy as np
+from numba import njit, prange
+from neat.graphs import feed_forward_layers
+
+# the neat-python activation and aggregation functions that NetworkBatch can use.
+# the codes are what activate_networks uses to pick one
+ACTIVATIONS = {
+    name: code
+    for code, name in enumerate(
+        (
+            "sigmoid",
+            "tanh",
+            "sin",
+            "gauss",
+            "relu",
+            "softplus",
+            "identity",
+            "clamped",
+            "inv",
+            "log",
+            "exp",
+            "abs",
+            "hat",
+            "square",
+            "cube",
+        )
+    )
+}
+AGGREGATIONS = {
+    name: code
+    for code, name in enumerate(("sum", "product", "max", "min", "maxabs", "mean"))
+}
+
+
+class NetworkBatch:
+    """the feed-forward networks of a generation's genomes, compiled into padded
+    arrays so that the networks of all the hunting mice can be activated with one
+    call per frame. Row r of every array is the network of genomes[r].
+
+    Each network is a list of nodes in the order neat.nn.FeedForwardNetwork
+    evaluates them, padded to the longest list. Node n of row r:
+        node_slots[r, n] is where its value is kept in the row's values
+        node_biases, node_responses are its bias and response
+        node_activations, node_aggregations are codes for its functions
+        link_counts[r, n] is how many connections feed into it
+        link_slots[r, n, :], link_weights[r, n, :] are the values and weights of
+        those connections, padded to the most connections that any node has
+    The values of the inputs are kept in the first slots of a row, followed by the
+    outputs, then the hidden nodes.
+    With copies > 1, the rows are repeated that many times, so row
+    c * len(genomes) + g is another copy of the network of genomes[g]. Each copy
+    keeps its own values"""
+
+    def __init__(self, genomes, neat_config, copies=1):
+        genome_config = neat_config.genome_config
+        self.input_count = len(genome_config.input_keys)
+        self.output_count = len(genome_config.output_keys)
+        row_count = len(genomes)
+
+        networks = [self.get_node_evals(genome, genome_config) for _, genome in genomes]
+        node_max = max([len(node_evals) for node_evals in networks] + [1])
+        link_max = max(
+            [len(links) for node_evals in networks for *_, links in node_evals] + [1]
+        )
+        slot_max = self.input_count + self.output_count + node_max
+
+        self.node_counts = np.zeros(row_count, dtype=np.int64)
+        self.node_slots = np.zeros((row_count, node_max), dtype=np.int64)
+        self.node_biases = np.zeros((row_count, node_max))
+        self.node_responses = np.zeros((row_count, node_max))
+        self.node_activations = np.zeros((row_count, node_max), dtype=np.int64)
+        self.node_aggregations = np.zeros((row_count, node_max), dtype=np.int64)
+        self.link_counts = np.zeros((row_count, node_max), dtype=np.int64)
+        self.link_slots = np.zeros((row_count, node_max, link_max), dtype=np.int64)
+        self.link_weights = np.zeros((row_count, node_max, link_max))
+        # values are kept between activations, as in neat.nn.FeedForwardNetwork,
+        # so an output that isn't connected to anything stays at zero
+        self.values = np.zeros((row_count, slot_max))
+        self.outputs = np.zeros((row_count, self.output_count))
+
+        for row, node_evals in enumerate(networks):
+            slots = {key: slot for slot, key in enumerate(genome_config.input_keys)}
+            for slot, key in enumerate(genome_config.output_keys):
+                slots[key] = self.input_count + slot
+            for node, *_ in node_evals:
+                if node not in slots:
+                    slots[node] = len(slots)
+
+            self.node_counts[row] = len(node_evals)
+            for n, (node, activation, aggregation, bias, response, links) in enumerate(
+                node_evals
+            ):
+                self.node_slots[row, n] = slots[node]
+                self.node_biases[row, n] = bias
+                self.node_responses[row, n] = response
+                self.node_activations[row, n] = ACTIVATIONS[activation]
+                self.node_aggregations[row, n] = AGGREGATIONS[aggregation]
+                self.link_counts[row, n] = len(links)
+                for link, (input_node, weight) in enumerate(links):
+                    self.link_slots[row, n, link] = slots[input_node]
+                    self.link_weights[row, n, link] = weight
+
+        if copies > 1:
+            for name in (
+                "node_counts",
+                "node_slots",
+                "node_biases",
+                "node_responses",
+                "node_activations",
+                "node_aggregations",
+                "link_counts",
+                "link_slots",
+                "link_weights",
+                "values",
+                "outputs",
+            ):
+                array = getattr(self, name)
+                setattr(self, name, np.tile(array, (copies,) + (1,) * (array.ndim - 1)))
+
+    @staticmethod
+    def get_node_evals(genome, genome_config):
+        """the nodes of a genome's network in the order they're evaluated, as in
+        neat.nn.FeedForwardNetwork.create, with the names of their functions"""
+        connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+
+        layers = feed_forward_layers(
+            genome_config.input_keys, genome_config.output_keys, connections
+        )
+        node_evals = []
+        for layer in layers:
+            for node in layer:
+                links = []
+                for conn_key in connections:
+                    input_node, output_node = conn_key
+                    if output_node == node:
+                        links.append((input_node, genome.connections[conn_key].weight))
+
+                node_gene = genome.nodes[node]
+                if node_gene.activation not in ACTIVATIONS:
+                    raise ValueError(
+                        f"NetworkBatch can't use activation {node_gene.activation!r}"
+                    )
+                if node_gene.aggregation not in AGGREGATIONS:
+                    raise ValueError(
+                        f"NetworkBatch can't use aggregation {node_gene.aggregation!r}"
+                    )
+                node_evals.append(
+                    (
+                        node,
+                        node_gene.activation,
+                        node_gene.aggregation,
+                        node_gene.bias,
+                        node_gene.response,
+                        links,
+                    )
+                )
+        return node_evals
+
+    def activate(self, inputs, idx):
+        """activate the networks in rows idx with the same rows of inputs.
+        Returns the outputs of those networks, one row each"""
+        activate_networks(
+            inputs,
+            idx,
+            self.values,
+            self.node_counts,
+            self.node_slots,
+            self.node_biases,
+            self.node_responses,
+            self.node_activations,
+            self.node_aggregations,
+            self.link_counts,
+            self.link_slots,
+            self.link_weights,
+            self.input_count,
+            self.outputs,
+        )
+        return self.outputs[idx]
+
+
+@njit(cache=True)
+def activation_function(activation, z):
+    """the neat-python activation functions"""
+    if activation == 0:  # sigmoid
+        z = max(-60.0, min(60.0, 5.0 * z))
+        return 1.0 / (1.0 + math.exp(-z))
+    if activation == 1:  # tanh
+        z = max(-60.0, min(60.0, 2.5 * z))
+        return math.tanh(z)
+    if activation == 2:  # sin
+        z = max(-60.0, min(60.0, 5.0 * z))
+        return math.sin(z)
+    if activation == 3:  # gauss
+        z = max(-3.4, min(3.4, z))
+        return math.exp(-5.0 * math.pow(z, 2.0))
+    if activation == 4:  # relu
+        return z if z > 0.0 else 0.0
+    if activation == 5:  # softplus
+        z = max(-60.0, min(60.0, 5.0 * z))
+        return 0.2 * math.log(1 + math.exp(z))
+    if activation == 6:  # identity
+        return z
+    if activation == 7:  # clamped
+        return max(-1.0, min(1.0, z))
+    if activation == 8:  # inv
+        return 0.0 if z == 0.0 else 1.0 / z
+    if activation == 9:  # log
+        return math.log(max(1e-7, z))
+    if activation == 10:  # exp
+        return math.exp(max(-60.0, min(60.0, z)))
+    if activation == 11:  # abs
+        return abs(z)
+    if activation == 12:  # hat
+        return max(0.0, 1 - abs(z))
+    if activation == 13:  # square
+        return math.pow(z, 2.0)
+    return math.pow(z, 3.0)  # cube
+
+
+@njit(parallel=True, cache=True)
+def activate_networks(
+    inputs,
+    idx,
+    values,
+    node_counts,
+    node_slots,
+    node_biases,
+    node_responses,
+    node_activations,
+    node_aggregations,
+    link_counts,
+    link_slots,
+    link_weights,
+    input_count,
+    outputs,
+):
+    """evaluate the networks in rows idx, sharing them between cores. Within a
+    network the nodes and their connections are added up in the same order as
+    neat.nn.FeedForwardNetwork.activate, so the outputs are the same"""
+    for i in prange(idx.shape[0]):
+        row = idx[i]
+        for slot in range(input_count):
+            values[row, slot] = inputs[row, slot]
+
+        for n in range(node_counts[row]):
+            aggregation = node_aggregations[row, n]
+            link_count = link_counts[row, n]
+            total = 0.0
+            if aggregation == 1:  # product
+                total = 1.0
+            for link in range(link_count):
+                x = values[row, link_slots[row, n, link]] * link_weights[row, n, link]
+                if aggregation == 0 or aggregation == 5:  # sum, mean
+                    total += x
+                elif aggregation == 1:  # product
+                    total *= x
+                elif link == 0:
+                    total = x
+                elif aggregation == 2:  # max
+                    total = max(total, x)
+                elif aggregation == 3:  # min
+                    total = min(total, x)
+                elif abs(x) > abs(total):  # maxabs
+                    total = x
+            if aggregation == 5:
+                total /= link_count
+
+            values[row, node_slots[row, n]] = activation_function(
+                node_activations[row, n],
+                node_biases[row, n] + node_responses[row, n] * total,
+            )
+
+        for output in range(outputs.shape[1]):
+            outputs[row, output] = values[row, input_count + output]
@@ -0,0 +1,127 @@
+"""
+Evaluates a generation's genomes on a pool of processes.
+Every process simulates its share of the population in the same mazes.
+"""
+
+import contextlib
+import multiprocessing
+from multiprocessing import resource_tracker
+
+import numba
+
+import config
+from shared_maze import SharedMaze, attach_maze, detach_maze
+from simulation import Simulation
+
+# set in each worker process by init_worker
+worker_neat_config = None
+# the mazes a worker is attached to and the handles they were attached with
+worker_mazes = []
+worker_maze_handles = None
+
+
+def init_worker(neat_config, phase_timings):
+    global worker_neat_config
+    worker_neat_config = neat_config
+    # the workers time their simulations if the main process would have
+    config.PHASE_TIMINGS = phase_timings
+    # the workers already keep the cores busy, so each one only needs one numba thread
+    numba.set_num_threads(1)
+
+
+def get_worker_mazes(maze_handles):
+    """attach to a generation's shared mazes the first time a worker sees them,
+    letting go of the previous generation's mazes"""
+    global worker_mazes
+    global worker_maze_handles
+    if maze_handles != worker_maze_handles:
+        for maze1 in worker_mazes:
+            detach_maze(maze1)
+        worker_mazes = [attach_maze(maze_handle) for maze_handle in maze_handles]
+        worker_maze_handles = maze_handles
+    return worker_mazes
+
+
+def evaluate_batch(task):
+    """simulate one batch of genomes. Runs in a worker process"""
+    start, genomes, generation, maze_handles, initial_direction_radians = task
+    mazes = get_worker_mazes(maze_handles)
+    # a batch is only part of the population, so it can't tell which genomes
+    # can't be chosen to reproduce
+    simulation = Simulation(
+        genomes,
+        worker_neat_config,
+        generation,
+        mazes,
+        initial_direction_radians,
+        prune=False,
+    )
+    simulation.run()
+    fitnesses = [genome.fitness for _, genome in genomes]
+    return start, fitnesses, simulation.outcome_counts(), simulation.timer
+
+
+class ParallelEvaluator:
+    """splits the population into small batches and hands them out to the worker
+    processes as they become free. Mice can stop hunting at very different frames,
+    so a worker that gets quick batches just takes more of them, rather than being
+    left idle while the others finish.
+    The mazes are published once per generation in shared memory, so only the
+    genomes are sent with each batch.
+    Mice aren't pruned (see PRUNE in config.py), as each batch only knows the
+    fitnesses of its own genomes, not those of the whole population"""
+
+    def __init__(self, num_workers, neat_config, batch_size):
+        if config.PRUNE:
+            print("PRUNE is off when evaluating on more than one process")
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        # start the tracker for shared memory before the workers are created, so that
+        # they share it and don't each think the shared mazes have leaked when they exit
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(
+            num_workers,
+            initializer=init_worker,
+            initargs=(neat_config, config.PHASE_TIMINGS),
+        )
+
+    def evaluate(
+        self, genomes, generation, mazes, initial_direction_radians, timer=None
+    ):
+        """set the fitness of every genome and return how many mice stopped hunting
+        for each reason. If timer is given, the phase timings of every batch are
+        added to it (see PhaseTimer)"""
+        outcome_counts = {}
+        with contextlib.ExitStack() as stack:
+            maze_handles = [
+                stack.enter_context(SharedMaze(maze1)).handle for maze1 in mazes
+            ]
+            tasks = [
+                (
+                    start,
+                    genomes[start : start + self.batch_size],
+                    generation,
+                    maze_handles,
+                    initial_direction_radians,
+                )
+                for start in range(0, len(genomes), self.batch_size)
+            ]
+
+            for (
+                start,
+                fitnesses,
+                batch_outcome_counts,
+                batch_timer,
+            ) in self.pool.imap_unordered(evaluate_batch, tasks, chunksize=1):
+                for offset, fitness in enumerate(fitnesses):
+                    genomes[start + offset][1].fitness = fitness
+                for stats_key, count in batch_outcome_counts.items():
+                    outcome_counts[stats_key] = outcome_counts.get(stats_key, 0) + count
+                if timer is not None and batch_timer is not None:
+                    timer.add(batch_timer)
+
+        return outcome_counts
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
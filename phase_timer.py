@@ -0,0 +1,99 @@
+"""
+Timers for the phases of the frame loop, cheap enough to leave on in long runs
+(see PHASE_TIMINGS in config.py). A PhaseTimer is a lap timer: each call to lap adds
+the time since the last call to a phase, so timing a phase costs one call to
+time.perf_counter. The totals for a generation are written as one record.
+"""
+
+import csv
+import json
+import os
+import time
+
+# setting up a Simulation, the phases of Simulation.step and the snapshots taken
+# between frames
+SIMULATION_PHASES = (
+    "setup",
+    "sensing",
+    "activation",
+    "moving",
+    "trail stamping",
+    "fading",
+    "statuses",
+    "snapshots",
+    "other",
+)
+# the phases of the viewer's loop
+VIEWER_PHASES = (
+    "event pumping",
+    "receiving",
+    "trail drawing",
+    "mouse drawing",
+    "display",
+    "waiting",
+)
+
+
+class PhaseTimer:
+    """how long has been spent in each phase, and how many frames and mouse steps
+    (one mouse moving on one frame) there have been. When a generation is split into
+    batches, the frames of every batch are counted"""
+
+    def __init__(self, phases):
+        self.seconds = dict.fromkeys(phases, 0.0)
+        self.frames = 0
+        self.mouse_steps = 0
+        self.lap_time = time.perf_counter()
+
+    def lap(self, phase):
+        """add the time since the last lap to a phase"""
+        lap_time = time.perf_counter()
+        self.seconds[phase] += lap_time - self.lap_time
+        self.lap_time = lap_time
+
+    def add(self, timer):
+        """add another timer's totals to this one's, e.g. from a worker process"""
+        for phase, seconds in timer.seconds.items():
+            self.seconds[phase] += seconds
+        self.frames += timer.frames
+        self.mouse_steps += timer.mouse_steps
+
+    def get_record(self, generation, seconds):
+        """the totals as a flat dict, with the costs per mouse step in microseconds.
+        seconds is how long the generation took from start to finish, which is less
+        than the total of the phases if they were timed in several processes"""
+        record = {
+            "generation": generation,
+            "timestamp": time.time(),
+            "seconds": seconds,
+            "frames": self.frames,
+            "mouse steps": self.mouse_steps,
+            "frames per second": self.frames / seconds if seconds > 0 else 0.0,
+            "mouse steps per second": (
+                self.mouse_steps / seconds if seconds > 0 else 0.0
+            ),
+        }
+        for phase, phase_seconds in self.seconds.items():
+            record[f"{phase} seconds"] = phase_seconds
+            record[f"{phase} us per mouse step"] = (
+                1e6 * phase_seconds / self.mouse_steps if self.mouse_steps > 0 else 0.0
+            )
+        return record
+
+
+def write_record(file_name, record):
+    """append a record to a file, as a row of CSV if the file name ends in .csv
+    (with a header if the file is new), otherwise as a line of JSON"""
+    directory = os.path.dirname(file_name)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if file_name.endswith(".csv"):
+        new_file = not os.path.exists(file_name)
+        with open(file_name, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(record))
+            if new_file:
+                writer.writeheader()
+            writer.writerow(record)
+    else:
+        with open(file_name, "a") as f:
+            f.write(json.dumps(record) + "\n")
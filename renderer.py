@@ -0,0 +1,50 @@
+import pygame
+
+
+class Renderer:
+    """puts layers of surfaces, and sprites, on the screen, but only where they've
+    changed. Anything that draws on a layer marks the rectangles it changed, and
+    render redraws the layers in just those rectangles and sends them to the display
+    in one update. layers are drawn in order, then the sprites, then the overlays
+    (e.g. the stats panel, which is drawn over the sprites)"""
+
+    def __init__(self, screen, layers, sprites, overlays):
+        self.screen = screen
+        self.layers = layers
+        self.sprites = sprites
+        self.overlays = overlays
+        self.screen_rect = screen.get_rect()
+        self.dirty_rects = []
+        # when this much of the screen has changed, just redraw all of it
+        self.full_area = self.screen_rect.width * self.screen_rect.height // 2
+        self.mark_all()
+
+    def mark(self, rects):
+        """mark some rectangles of the screen as changed"""
+        for rect in rects:
+            rect = self.screen_rect.clip(rect)
+            if rect.width > 0 and rect.height > 0:
+                self.dirty_rects.append(rect)
+
+    def mark_all(self):
+        """mark the whole screen as changed"""
+        self.dirty_rects = [self.screen_rect.copy()]
+
+    def render(self):
+        """redraw what has changed and send it to the display"""
+        if len(self.dirty_rects) == 0:
+            return
+        rects = self.dirty_rects
+        if sum(rect.width * rect.height for rect in rects) > self.full_area:
+            rects = [self.screen_rect.copy()]
+        self.dirty_rects = []
+
+        for rect in rects:
+            self.screen.set_clip(rect)
+            for layer in self.layers:
+                self.screen.blit(layer, rect, rect)
+            self.sprites.draw(self.screen)
+            for overlay in self.overlays:
+                self.screen.blit(overlay, rect, rect)
+        self.screen.set_clip(None)
+        pygame.display.update(rects)
@@ -0,0 +1,119 @@
+"""
+Shares a generation's maze between processes without pickling its arrays.
+The parent publishes the arrays once into multiprocessing.shared_memory and the
+workers attach to them as read-only numpy views.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from maze import Maze
+
+# the numpy arrays of a solved Maze that are shared, including any lookup tables
+# derived from it. Attributes that are None aren't shared, and empty arrays (e.g.
+# maze_big when it isn't made) are sent in the handle rather than in shared memory
+SHARED_ARRAYS = (
+    "maze_tiny",
+    "maze_big",
+    "distance_score",
+    "path",
+    "distance_to_exit",
+    "on_path",
+    "wall_distance_table",
+)
+# the other attributes of a Maze that are copied to the workers
+SHARED_VALUES = (
+    "maze_title",
+    "from_saved",
+    "file_name",
+    "saved_number",
+    "is_solved",
+    "path_distance",
+)
+
+
+class SharedMaze:
+    """the arrays of a maze published into shared memory for a generation.
+    Use it as a context manager, so the shared memory is freed at the end:
+
+        with SharedMaze(maze1) as shared_maze:
+            ... pass shared_maze.handle to the workers ...
+
+    handle is small and can be pickled. Workers turn it back into a Maze with
+    attach_maze"""
+
+    def __init__(self, maze1):
+        self.segments = []
+        arrays = {}
+        for name in SHARED_ARRAYS:
+            array = getattr(maze1, name)
+            if array is None:
+                continue
+            array = np.asarray(array)
+            if array.nbytes == 0:
+                # shared memory can't be zero bytes long
+                arrays[name] = (None, array.shape, array.dtype.str)
+                continue
+            segment = shared_memory.SharedMemory(create=True, size=array.nbytes)
+            self.segments.append(segment)
+            shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+            shared_array[...] = array
+            arrays[name] = (segment.name, array.shape, array.dtype.str)
+
+        self.handle = (
+            (
+                maze1.rows,
+                maze1.cols,
+                maze1.square_size,
+                maze1.maze_directory,
+                maze1.make_maze_big,
+            ),
+            {name: getattr(maze1, name) for name in SHARED_VALUES},
+            arrays,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """free the shared memory. Workers that are still attached keep their
+        mapping until they detach"""
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+
+def attach_maze(handle):
+    """get a Maze whose arrays are read-only views of a SharedMaze.
+    The maze keeps the shared memory open until detach_maze is called"""
+    maze_args, values, arrays = handle
+    maze1 = Maze(*maze_args)
+    for name, value in values.items():
+        setattr(maze1, name, value)
+
+    maze1.shared_memory_segments = []
+    for name, (segment_name, shape, dtype) in arrays.items():
+        if segment_name is None:
+            array = np.empty(shape, dtype=np.dtype(dtype))
+        else:
+            segment = shared_memory.SharedMemory(name=segment_name)
+            maze1.shared_memory_segments.append(segment)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+        array.flags.writeable = False
+        setattr(maze1, name, array)
+
+    return maze1
+
+
+def detach_maze(maze1):
+    """stop using a maze from attach_maze. Its arrays can't be used after this"""
+    for name in SHARED_ARRAYS:
+        setattr(maze1, name, None)
+    for segment in maze1.shared_memory_segments:
+        segment.close()
+    maze1.shared_memory_segments = []
@@ -0,0 +1,268 @@
+"""
+Runs a generation of mice in one or more mazes without drawing anything.
+Nothing in here imports pygame, so it can be used on machines without a display.
+"""
+
+import math
+import threading
+
+import numpy as np
+
+import config
+import maze
+import mouse
+import mouse_batch
+import mouse_vision
+from mouse_batch import MouseBatch
+from network_batch import NetworkBatch
+from phase_timer import SIMULATION_PHASES, PhaseTimer
+
+# the stats that count how many mice have stopped hunting for each reason
+STATS_KEYS = {
+    mouse_batch.SUCCESSFUL: "mice successful",
+    mouse_batch.CRASHED: "mice crashed",
+    mouse_batch.SPUNOUT: "mice spun out",
+    mouse_batch.TIMEDOUT: "mice timed out",
+    mouse_batch.POTTERING: "mice pottering",
+    mouse_batch.PRUNED: "mice pruned",
+}
+
+
+def new_maze(rng=None):
+    """create and solve a maze for a generation. rng is a numpy Generator;
+    see Backtracking"""
+    maze1 = maze.Maze(
+        config.MAZE_ROWS,
+        config.MAZE_COLS,
+        config.MAZE_SQUARE_SIZE,
+        config.MAZE_DIRECTORY,
+        make_maze_big=not config.WALLS_FROM_MAZE_TINY,
+    )
+    maze1.create(rng)
+    maze1.solve()
+    if config.WALL_DISTANCE_TABLE:
+        # made from maze_tiny, even if there's a maze_big, as it's much quicker.
+        # Off the main thread (e.g. in a MazePrefetcher) it's made on one core, as
+        # the simulation's parallel kernels may be running on the main thread
+        if threading.current_thread() is threading.main_thread():
+            get_wall_distance_table = mouse_vision.get_wall_distance_table
+        else:
+            get_wall_distance_table = mouse_vision.get_wall_distance_table_serial
+        maze1.wall_distance_table = get_wall_distance_table(
+            maze1.maze_tiny != 0,
+            config.MAZE_SQUARE_SIZE,
+            config.WALL_DISTANCE_TABLE_HEADINGS,
+        )
+    return maze1
+
+
+def reduce_scores(scores):
+    """combine the scores of a genome's mice in each of the generation's mazes
+    into its fitness, as set by MAZES_FITNESS. scores has a row for each maze and
+    can have a column for each of a number of genomes"""
+    if config.MAZES_FITNESS == "min":
+        return np.min(scores, axis=0)
+    if config.MAZES_FITNESS == "quantile":
+        return np.quantile(scores, config.MAZES_FITNESS_QUANTILE, axis=0)
+    return np.mean(scores, axis=0)
+
+
+class Simulation:
+    """a generation of mice hunting in a list of mazes, with a mouse for each genome
+    in each maze. They are all simulated together, as one batch of mice.
+    A genome's fitness is set when all of its mice have stopped hunting.
+    The mice all start off in initial_direction_radians.
+    If PRUNE is on, every PRUNE_EVERY_FRAMES frames the mice of genomes that can
+    no longer get a fitness good enough to be chosen to reproduce are stopped.
+    NEAT keeps the best survival_threshold of the genomes (at least elitism of
+    them) to breed from, so that's how many genomes with known fitnesses must
+    have a better fitness than a genome could possibly get for its mice to be
+    stopped. NEAT does this for each species, so pruning can stop a mouse that
+    would have survived in a weak species. The genomes must be the whole
+    population for this, so prune can be set to False to switch it off when
+    they're only part of it"""
+
+    def __init__(
+        self,
+        genomes,
+        neat_config,
+        generation,
+        mazes,
+        initial_direction_radians,
+        prune=None,
+    ):
+        self.genomes = genomes
+        self.prune_mice = config.PRUNE if prune is None else prune
+        self.generation = generation
+        self.mazes = mazes
+        # the maze that's drawn when there's only room to show one
+        self.maze = mazes[0]
+        self.window_size = (config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
+        self.frame_number = 0
+        # how long each phase of a frame takes, if PHASE_TIMINGS is on
+        self.timer = PhaseTimer(SIMULATION_PHASES) if config.PHASE_TIMINGS else None
+
+        maze_area = (
+            (config.MAZE_ROWS - 2) * (config.MAZE_COLS - 2) * config.MAZE_SQUARE_SIZE
+        )
+        # max_distance = round(
+        #     (2.5 * maze_area + 1500 * math.sqrt(generation))
+        #     / mouse.OPTIMISE_MOUSE_SPEED_MAX_INITIAL
+        # )
+        self.max_distance = round(
+            6.0 * maze_area / mouse.OPTIMISE_MOUSE_SPEED_MAX_INITIAL
+        )
+
+        self.stats_info_global = {
+            "max distace": self.max_distance,
+            "generation": generation,
+            "frame": 0,
+            "mice hunting": 0,
+            "mice successful": 0,
+            "mice crashed": 0,
+            "mice spun out": 0,
+            "mice timed out": 0,
+            "mice pottering": 0,
+            "mice pruned": 0,
+        }
+        reproduction_config = neat_config.reproduction_config
+        self.prune_rank = max(
+            reproduction_config.elitism,
+            math.ceil(reproduction_config.survival_threshold * len(genomes)),
+        )
+
+        # mouse m is in maze m // len(genomes) and belongs to genome m % len(genomes)
+        self.networks = NetworkBatch(genomes, neat_config, len(mazes))
+        for _, genome in genomes:
+            genome.fitness = 0
+
+        walls = [maze1.get_walls() for maze1 in mazes]
+        wall_distance_table = None
+        if self.maze.wall_distance_table is not None:
+            wall_distance_table = self.stack(
+                [maze1.wall_distance_table for maze1 in mazes]
+            )
+        self.mice = MouseBatch(
+            len(genomes) * len(mazes),
+            self.window_size,
+            self.stack([maze_walls for maze_walls, _ in walls]),
+            [maze1.path_distance for maze1 in mazes],
+            [maze1.distance_score for maze1 in mazes],
+            self.max_distance,
+            initial_direction_radians,
+            walls[0][1],
+            wall_distance_table,
+            np.repeat(np.arange(len(mazes)), len(genomes)),
+        )
+
+    @staticmethod
+    def stack(arrays):
+        """one array for each maze stacked into one, without copying if there's
+        only one maze"""
+        if len(arrays) == 1:
+            return np.asarray(arrays[0])[np.newaxis]
+        return np.stack(arrays)
+
+    def step(self):
+        """move every hunting mouse on by one frame and return how many are still hunting"""
+        timer = self.timer
+        if timer is not None:
+            timer.lap("other")
+        self.frame_number += 1
+        self.stats_info_global["frame"] = self.frame_number
+
+        hunting = self.mice.hunting()
+        idx = self.mice.get_maze_wall_distances(hunting)
+        if timer is not None:
+            timer.lap("sensing")
+
+        outputs = self.networks.activate(self.mice.inputs, idx)
+        steering_radians_scaled = outputs[:, 0]
+        speed_delta_scaled = outputs[:, 1]
+        if timer is not None:
+            timer.lap("activation")
+        self.mice.move_scaled(idx, steering_radians_scaled, speed_delta_scaled)
+        if timer is not None:
+            timer.lap("moving")
+        self.mice.update_visited(idx)
+        if timer is not None:
+            timer.lap("trail stamping")
+        self.mice.fade_visited(idx)
+        if timer is not None:
+            timer.lap("fading")
+        self.mice.update_statuses(idx)
+
+        self.mice_finished(hunting[self.mice.status[hunting] != mouse_batch.HUNTING])
+        if self.prune_mice and self.frame_number % config.PRUNE_EVERY_FRAMES == 0:
+            self.prune()
+
+        mice_hunting = int(np.count_nonzero(self.mice.status == mouse_batch.HUNTING))
+        self.stats_info_global["mice hunting"] = mice_hunting
+        if timer is not None:
+            timer.lap("statuses")
+            timer.frames += 1
+            timer.mouse_steps += len(idx)
+        return mice_hunting
+
+    def mice_finished(self, idx):
+        """record the fitness of genomes whose mice have all stopped hunting,
+        now that the mice in idx have"""
+        genome_count = len(self.genomes)
+        scores = self.mice.score.reshape(-1, genome_count)
+        hunting = (self.mice.status == mouse_batch.HUNTING).reshape(-1, genome_count)
+        for genome_index in np.unique(idx % genome_count):
+            if not hunting[:, genome_index].any():
+                self.genomes[genome_index][1].fitness = float(
+                    reduce_scores(scores[:, genome_index])
+                )
+
+        status_counts = np.bincount(self.mice.status[idx], minlength=max(STATS_KEYS) + 1)
+        for status, stats_key in STATS_KEYS.items():
+            self.stats_info_global[stats_key] += int(status_counts[status])
+
+    def prune(self):
+        """stop the mice of genomes whose best possible fitness is worse than the
+        fitness of prune_rank genomes that have already finished. They get the
+        score they have now"""
+        genome_count = len(self.genomes)
+        hunting = self.mice.status == mouse_batch.HUNTING
+        genomes_hunting = hunting.reshape(-1, genome_count).any(axis=0)
+        if not genomes_hunting.any():
+            return
+        fitnesses = reduce_scores(self.mice.score.reshape(-1, genome_count))
+        finished_fitnesses = fitnesses[~genomes_hunting]
+        if len(finished_fitnesses) < self.prune_rank:
+            return
+        cutoff = np.partition(finished_fitnesses, -self.prune_rank)[-self.prune_rank]
+
+        # the score of every mouse that has stopped, and the best the rest can get
+        score_bounds = self.mice.score.copy()
+        idx = np.flatnonzero(hunting)
+        score_bounds[idx] = self.mice.get_score_bounds(idx)
+        fitness_bounds = reduce_scores(score_bounds.reshape(-1, genome_count))
+
+        genomes_pruned = genomes_hunting & (fitness_bounds < cutoff)
+        idx = np.flatnonzero(hunting & np.tile(genomes_pruned, len(self.mazes)))
+        self.mice.finish(idx, mouse_batch.PRUNED)
+        self.mice_finished(idx)
+
+    def run(self, on_frame=None):
+        """run until none of the mice are hunting. on_frame, if given, is called with
+        the simulation after every frame"""
+        if self.timer is not None:
+            self.timer.lap("setup")
+        while True:
+            mice_hunting = self.step()
+            if on_frame is not None:
+                on_frame(self)
+                if self.timer is not None:
+                    self.timer.lap("snapshots")
+            if mice_hunting == 0:
+                break
+
+    def outcome_counts(self):
+        """how many mice stopped hunting for each reason"""
+        return {
+            stats_key: self.stats_info_global[stats_key]
+            for stats_key in STATS_KEYS.values()
+        }
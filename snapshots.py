@@ -0,0 +1,185 @@
+"""
+Sends snapshots of a running simulation to a viewer in another process (see
+viewer.py), so that drawing never holds up the simulation. Nothing in here imports
+pygame.
+
+A SnapshotPublisher listens for a viewer on VIEWER_ADDRESS. Viewers can attach
+and detach at any time, including to a headless run. While one is attached, the
+simulation hands the publisher a snapshot whenever the viewer has taken the last
+one, and a thread sends it. A snapshot is a dict:
+    generation, frame: where the simulation has got to
+    stats: the simulation's stats_info_global
+    maze_key: changes whenever there's a new maze
+    maze_tiny, maze_path: the maze to draw (see Maze)
+    window_size: the size of the maze in pixels
+    watched: None, or a dict about the mouse being watched, which is the first
+    hunting mouse. status, position, direction and whiskers as for
+    MouseDrawer.draw_mouse, and the tiles of its visited map that have changed since
+    the last snapshot (see VisitedMaps.take_changed_tiles): visited_tiles, their
+    (tile_x, tile_y), visited_alpha, their alphas as uint8 and visited_reset,
+    True if these are all of its tiles and any others should be cleared, because
+    a different mouse is being watched
+    trail: the positions of the hunting mice at every frame since the last snapshot
+    was sent and trail_colours, the colour of each as a 0 to 200 fraction of the
+    mouse's top speed. Snapshots that are never sent don't lose any trail
+"""
+
+import threading
+from multiprocessing.connection import Listener
+
+import numpy as np
+
+import config
+
+
+class SnapshotPublisher:
+    """serves snapshots of simulations to a viewer. Only one viewer is attached at
+    a time; a new one takes over from the last. address and authkey default to
+    VIEWER_ADDRESS and VIEWER_AUTHKEY"""
+
+    def __init__(self, address=None, authkey=None):
+        if address is None:
+            address = config.VIEWER_ADDRESS
+        if authkey is None:
+            authkey = config.VIEWER_AUTHKEY
+        self.listener = Listener(address, authkey=authkey)
+        self.connection = None
+        self.lock = threading.Lock()
+        self.snapshot_ready = threading.Condition(self.lock)
+        # the snapshot waiting to be sent, or being sent
+        self.snapshot = None
+        self.trail = []
+        self.trail_colours = []
+        self.simulation = None
+        self.maze_key = 0
+        # the mouse whose visited map the viewer has
+        self.watched_index = None
+        self.closed = False
+
+        threading.Thread(
+            target=self.accept_viewers, name="snapshot viewers", daemon=True
+        ).start()
+        threading.Thread(
+            target=self.send_snapshots, name="snapshot sender", daemon=True
+        ).start()
+
+    def accept_viewers(self):
+        """attach viewers as they connect"""
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # the listener has been closed
+                return
+            with self.lock:
+                if self.connection is not None:
+                    self.connection.close()
+                self.connection = connection
+                self.trail = []
+                self.trail_colours = []
+                self.watched_index = None
+
+    def update(self, simulation):
+        """note what has changed in a simulation after a frame. Does nothing unless a
+        viewer is attached"""
+        if self.connection is None:
+            return
+        if simulation is not self.simulation:
+            self.simulation = simulation
+            self.maze_key += 1
+            self.watched_index = None
+            # the trail that hasn't been sent yet is for the last maze
+            with self.lock:
+                self.trail = []
+                self.trail_colours = []
+
+        mice = simulation.mice
+        hunting = mice.hunting()
+        hunting = hunting[mice.maze_indexes[hunting] == 0]
+        trail_colours = np.rint(200 * mice.speed[hunting] / mice.speed_max[hunting])
+        with self.lock:
+            self.trail.append(mice.position_rounded[hunting].astype(np.int16))
+            self.trail_colours.append(trail_colours.astype(np.uint8))
+            wants_snapshot = self.snapshot is None
+
+        if wants_snapshot and simulation.frame_number % config.FRAME_DISPLAY_RATE == 0:
+            self.publish(self.get_snapshot(simulation, hunting))
+
+    def get_snapshot(self, simulation, hunting):
+        """a snapshot of a simulation, without the trail"""
+        mice = simulation.mice
+        watched = None
+        if len(hunting) > 0:
+            index = hunting[0]
+            visited_reset = index != self.watched_index
+            self.watched_index = index
+            visited_tiles, visited_alpha = mice.visited.take_changed_tiles(
+                index, take_all=visited_reset
+            )
+            watched = {
+                "status": int(mice.status[index]),
+                "position": tuple(mice.position_rounded[index]),
+                "direction": float(mice.direction_radians[index]),
+                "whiskers": mice.whiskers(index),
+                "visited_tiles": visited_tiles,
+                "visited_alpha": visited_alpha,
+                "visited_reset": visited_reset,
+            }
+        return {
+            "generation": simulation.generation,
+            "frame": simulation.frame_number,
+            "stats": dict(simulation.stats_info_global),
+            "maze_key": self.maze_key,
+            "maze_tiny": np.asarray(simulation.maze.maze_tiny),
+            "maze_path": simulation.maze.path,
+            "window_size": simulation.window_size,
+            "watched": watched,
+        }
+
+    def publish(self, snapshot):
+        """hand a snapshot to the sending thread"""
+        with self.snapshot_ready:
+            self.snapshot = snapshot
+            self.snapshot_ready.notify()
+
+    def send_snapshots(self):
+        """send each snapshot, with the trail so far, to the attached viewer.
+        A viewer that has gone away is detached"""
+        while True:
+            with self.snapshot_ready:
+                while self.snapshot is None and not self.closed:
+                    self.snapshot_ready.wait()
+                if self.closed:
+                    return
+                snapshot = self.snapshot
+                connection = self.connection
+                snapshot["trail"] = np.concatenate(
+                    self.trail + [np.zeros((0, 2), dtype=np.int16)]
+                )
+                snapshot["trail_colours"] = np.concatenate(
+                    self.trail_colours + [np.zeros(0, dtype=np.uint8)]
+                )
+                self.trail = []
+                self.trail_colours = []
+
+            try:
+                if connection is not None:
+                    connection.send(snapshot)
+            except (OSError, EOFError):
+                with self.lock:
+                    if self.connection is connection:
+                        self.connection = None
+                connection.close()
+
+            with self.lock:
+                self.snapshot = None
+
+    def close(self):
+        """stop serving snapshots, detaching any viewer"""
+        with self.snapshot_ready:
+            self.closed = True
+            self.snapshot_ready.notify()
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+        self.listener.close()
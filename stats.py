@@ -38,25 +38,70 @@ def stats_info_global_update(stats_info_global, start_time, mouse):
     )
 
 
-def stats_update(stats_surface, stats_info_mouse, stats_info_global):
-    """updates the stats surface with global and local stats"""
-    stats_surface.fill((0, 0, 0, 0))
-    font = pygame.font.SysFont("Arial", 12, bold=False)
-    text_top = 0
-
-    for stats in (stats_info_mouse, stats_info_global):
-        for stats_key, stats_value in stats.items():
-            if stats_value > 10:
-                stats_value = round(stats_value)
-            img = font.render(
-                stats_key + ": " + str(stats_value),
-                True,
-                pygame.Color(config.BLACK),
-                pygame.Color(config.WHITE),
-            )
-            img_size = img.get_size()
-            text_top += img_size[1] + 10
-            stats_surface.blit(img, (10, text_top))
+class StatsPanel:
+    """draws stats on a surface, a "key: value" line for each. The font is only
+    looked up once and each key and each character of the values is only rendered
+    once, into an atlas that the lines are put together from, so drawing a value
+    is just a few blits. Only the lines whose values have changed are drawn again"""
+
+    def __init__(self, stats_surface, font_name="Arial", font_size=12):
+        self.stats_surface = stats_surface
+        self.font = pygame.font.SysFont(font_name, font_size, bold=False)
+        self.line_height = self.font.get_height() + 10
+        # rendered "key: " labels by key and value characters by character
+        self.labels = {}
+        self.glyphs = {}
+        # the key, the value's text and the rectangle of each line that's drawn
+        self.lines = []
+
+    def render(self, text):
+        """render some text in the stats' colours"""
+        return self.font.render(
+            text, True, pygame.Color(config.BLACK), pygame.Color(config.WHITE)
+        )
+
+    def update(self, stats_info_mouse, stats_info_global):
+        """draw the stats that have changed. Returns the rectangles that have changed"""
+        lines = []
+        for stats in (stats_info_mouse, stats_info_global):
+            for stats_key, stats_value in stats.items():
+                if stats_value > 10:
+                    stats_value = round(stats_value)
+                lines.append((stats_key, str(stats_value)))
+
+        changed_rects = []
+        if [line[0] for line in lines] != [line[0] for line in self.lines]:
+            # the lines have moved, so they all have to be drawn again
+            self.stats_surface.fill((0, 0, 0, 0))
+            changed_rects += [line[2] for line in self.lines]
+            self.lines = [(stats_key, None, None) for stats_key, _ in lines]
+
+        for line_number, (stats_key, text) in enumerate(lines):
+            _, old_text, old_rect = self.lines[line_number]
+            if text == old_text:
+                continue
+            if old_rect is not None:
+                self.stats_surface.fill((0, 0, 0, 0), old_rect)
+                changed_rects.append(old_rect)
+            rect = self.draw_line(line_number, stats_key, text)
+            self.lines[line_number] = (stats_key, text, rect)
+            changed_rects.append(rect)
+        return changed_rects
+
+    def draw_line(self, line_number, stats_key, text):
+        """draw a line of the stats from the atlas. Returns the rectangle it's in"""
+        if stats_key not in self.labels:
+            self.labels[stats_key] = self.render(stats_key + ": ")
+        top = (line_number + 1) * self.line_height
+        rect = self.stats_surface.blit(self.labels[stats_key], (10, top))
+        left = rect.right
+        for character in text:
+            if character not in self.glyphs:
+                self.glyphs[character] = self.render(character)
+            glyph_rect = self.stats_surface.blit(self.glyphs[character], (left, top))
+            left = glyph_rect.right
+            rect.union_ip(glyph_rect)
+        return rect
 
 
 class MazeStats:
@@ -73,13 +118,16 @@ class MazeStats:
                 "status": mouse.status.name,
                 "score": mouse.score,
                 "filename": maze.file_name,
+                "saved_number": maze.saved_number,
             }
         )
 
     def save_to_file(self, stats_info_global):
         if not os.path.exists(config.MAZE_STATS_DIRECTORY):
             os.makedirs(config.MAZE_STATS_DIRECTORY)
-        with open(config.MAZE_STATS_DIRECTORY + "maze_stats.json", "w") as fout:
+        with open(
+            os.path.join(config.MAZE_STATS_DIRECTORY, "maze_stats.json"), "w"
+        ) as fout:
             fout.write("{\n")
             fout.write('"global":')
             json.dump(stats_info_global, fout, indent=0)
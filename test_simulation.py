@@ -0,0 +1,115 @@
+"""
+Tests for simulation.py. Run with python -m pytest
+"""
+
+import os
+import random
+import subprocess
+import sys
+import threading
+
+import neat
+import numpy as np
+import pytest
+
+import config
+import mouse_batch
+import simulation
+
+
+@pytest.fixture(scope="module")
+def neat_config():
+    return neat.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        os.path.join(os.path.dirname(__file__), "maze_mouse_neat.config"),
+    )
+
+
+@pytest.fixture(scope="module")
+def maze1():
+    return simulation.new_maze(np.random.default_rng(1))
+
+
+def get_genomes(neat_config, count):
+    random.seed(1)
+    return list(neat.Population(neat_config).population.items())[:count]
+
+
+def test_prune_when_every_mouse_stops_on_a_prune_frame(
+    monkeypatch, neat_config, maze1
+):
+    monkeypatch.setattr(config, "PRUNE", True)
+    monkeypatch.setattr(config, "PRUNE_EVERY_FRAMES", 1)
+    genomes = get_genomes(neat_config, 20)
+    maze_simulation = simulation.Simulation(genomes, neat_config, 1, [maze1], 0.0)
+    # every mouse times out on the first frame, which is a prune frame
+    maze_simulation.mice.max_distance = -1
+
+    assert maze_simulation.step() == 0
+    assert np.all(maze_simulation.mice.status == mouse_batch.TIMEDOUT)
+    assert maze_simulation.outcome_counts()["mice pruned"] == 0
+    assert all(genome.fitness is not None for _, genome in genomes)
+
+
+def test_get_score_bounds_of_no_mice(neat_config, maze1):
+    genomes = get_genomes(neat_config, 5)
+    maze_simulation = simulation.Simulation(genomes, neat_config, 1, [maze1], 0.0)
+
+    score_bounds = maze_simulation.mice.get_score_bounds(np.zeros(0, dtype=np.intp))
+    assert score_bounds.shape == (0,)
+
+
+def build_tables_while_stepping(tables=3):
+    """step a simulation while a wall distance table is built on another thread,
+    as a MazePrefetcher does, until tables have been built"""
+    config.WALL_DISTANCE_TABLE = True
+    neat_config = neat.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        os.path.join(os.path.dirname(__file__), "maze_mouse_neat.config"),
+    )
+    genomes = get_genomes(neat_config, 50)
+    maze1 = simulation.new_maze(np.random.default_rng(1))
+    built = [0]
+    stopping = threading.Event()
+
+    def build_tables():
+        rng = np.random.default_rng(2)
+        while not stopping.is_set():
+            simulation.new_maze(rng)
+            built[0] += 1
+
+    thread = threading.Thread(target=build_tables)
+    thread.start()
+    try:
+        while built[0] < tables:
+            maze_simulation = simulation.Simulation(
+                genomes, neat_config, 1, [maze1], 0.0
+            )
+            while maze_simulation.step() > 0 and built[0] < tables:
+                pass
+    finally:
+        stopping.set()
+        thread.join()
+
+
+def test_wall_distance_table_built_while_stepping():
+    # numba's workqueue threading layer aborts the process if parallel kernels are
+    # run from two threads at once, so this is run in a process of its own
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import test_simulation; test_simulation.build_tables_while_stepping()",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "NUMBA_THREADING_LAYER": "workqueue"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
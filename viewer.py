@@ -0,0 +1,268 @@
+"""
+Draws a running simulation with pygame, in a process of its own, from the snapshots
+that a SnapshotPublisher sends (see snapshots.py). It draws at the display's
+refresh rate and only ever draws the latest snapshot, so it never holds up the
+simulation.
+
+main_maze_neat.py starts one unless it's run with --headless. To watch a headless
+run that was started with --serve, run:
+    python viewer.py
+Closing the window detaches the viewer and leaves the run going.
+"""
+
+import argparse
+import time
+from multiprocessing.connection import Client
+
+import pygame
+
+import config
+import stats
+from maze_drawer import MazeDrawer
+from mouse import MouseStatus
+from mouse_drawer import MouseDrawer
+from phase_timer import VIEWER_PHASES, PhaseTimer, write_record
+from renderer import Renderer
+
+
+class Viewer:
+    """draws the snapshots that arrive on a connection. If phase_timings is True,
+    how long each phase of its loop takes is written for each generation to
+    VIEWER_PHASE_TIMINGS_FILE (see phase_timer.py)"""
+
+    def __init__(self, connection, phase_timings=False):
+        self.connection = connection
+        self.phase_timings = phase_timings
+        self.timer = None
+        self.timer_generation = None
+        self.timer_start = None
+        self.maze_key = None
+        self.window_size = None
+
+        # initialize the pygame module
+        pygame.init()
+        # load and set the logo
+        logo = pygame.image.load("logo32x32.png")
+        pygame.display.set_icon(logo)
+        pygame.display.set_caption("Not AI mouse")
+
+    def new_window(self, window_size):
+        """set up the window and the surfaces that are drawn on it"""
+        self.window_size = window_size
+
+        # create a surface on screen that has the size defined globally
+        self.screen = pygame.display.set_mode(window_size)
+        self.background = pygame.Surface(window_size)
+
+        self.maze_path_surface = pygame.Surface(window_size)  # , pygame.SRCALPHA, 32)
+        self.maze_path_surface.set_alpha(60)
+
+        visited_by_mouse_screen = pygame.Surface(window_size, pygame.SRCALPHA, 32)
+        visited_by_mouse_screen = visited_by_mouse_screen.convert_alpha()
+
+        maze_wall_distances_screen = pygame.Surface(window_size, pygame.SRCALPHA, 32)
+        maze_wall_distances_screen = maze_wall_distances_screen.convert_alpha()
+
+        self.stats_surface = pygame.Surface(window_size)
+        self.stats_surface = self.stats_surface.convert_alpha()
+        self.stats_surface.fill((0, 0, 0, 0))
+        self.stats_panel = stats.StatsPanel(self.stats_surface)
+
+        self.mouse_drawer = MouseDrawer(
+            self.background,
+            visited_by_mouse_screen,
+            maze_wall_distances_screen,
+        )
+        self.renderer = Renderer(
+            self.screen,
+            [
+                self.background,
+                self.maze_path_surface,
+                visited_by_mouse_screen,
+                maze_wall_distances_screen,
+            ],
+            self.mouse_drawer.mouse_icon_group,
+            [self.stats_surface],
+        )
+
+    def new_maze(self, snapshot):
+        """draw a new maze on the surfaces, which are only made again if the window
+        has changed size"""
+        self.maze_key = snapshot["maze_key"]
+        window_size = snapshot["window_size"]
+        if window_size != self.window_size:
+            self.new_window(window_size)
+
+        maze_tiny = snapshot["maze_tiny"]
+        maze_drawer = MazeDrawer(
+            maze_tiny.shape, window_size, self.background, self.maze_path_surface
+        )
+        maze_drawer.draw_maze(maze_tiny, config.PURE_WHITE, config.BLACK)
+        maze_drawer.draw_shortest_path(snapshot["maze_path"])
+        maze_drawer.draw_start(
+            self.background, config.MAZE_SQUARE_SIZE, (100, 100, 100)
+        )
+        maze_drawer.draw_finish(
+            window_size, self.background, config.MAZE_SQUARE_SIZE, (100, 100, 100)
+        )
+
+        self.mouse_drawer.visited_by_mouse_screen.fill((0, 0, 0, 0))
+        self.mouse_drawer.maze_wall_distances_screen.fill((0, 0, 0, 0))
+        self.mouse_drawer.whiskers_rect = None
+        self.mouse_drawer.take_dirty_rects()
+        self.renderer.mark_all()
+
+    def run(self):
+        """main loop. Returns when the window is closed or the simulation goes away"""
+        try:
+            self.run_loop()
+        finally:
+            self.write_timings()
+
+    def run_loop(self):
+        """draw snapshots until the window is closed or the simulation goes away"""
+        clock = pygame.time.Clock()
+        paused = False
+        while True:
+            # event handling, gets all event from the event queue
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        return
+                    elif event.key == pygame.K_SPACE:
+                        paused = not paused
+            self.lap("event pumping")
+
+            try:
+                snapshot = self.receive()
+            except (EOFError, OSError):
+                return
+            if snapshot is not None and not paused:
+                self.draw(snapshot)
+            clock.tick(config.VIEWER_FPS)
+            self.lap("waiting")
+            if self.timer is not None:
+                self.timer.frames += 1
+
+    def receive(self):
+        """take every snapshot that has arrived, drawing their trails, and return the
+        latest one, or None if none have arrived"""
+        snapshot = None
+        while self.connection.poll():
+            snapshot = self.connection.recv()
+            self.time_generation(snapshot["generation"])
+            self.lap("receiving")
+            if snapshot["maze_key"] != self.maze_key:
+                self.new_maze(snapshot)
+            self.mouse_drawer.draw_mouse_trails(
+                snapshot["trail"], snapshot["trail_colours"]
+            )
+            self.lap("trail drawing")
+            if self.timer is not None:
+                self.timer.mouse_steps += len(snapshot["trail"])
+        return snapshot
+
+    def draw(self, snapshot):
+        """draw the watched mouse and the stats, then show what has changed"""
+        watched = snapshot["watched"]
+        if watched is not None:
+            self.mouse_drawer.draw_mouse(
+                MouseStatus(watched["status"]),
+                watched["position"],
+                watched["direction"],
+                watched["whiskers"],
+            )
+            self.mouse_drawer.draw_visited_tiles(
+                config.MAZE_SQUARE_SIZE,
+                watched["visited_tiles"],
+                watched["visited_alpha"],
+                watched["visited_reset"],
+            )
+
+        self.renderer.mark(self.stats_panel.update({}, snapshot["stats"]))
+        self.renderer.mark(self.mouse_drawer.take_dirty_rects())
+        self.lap("mouse drawing")
+        self.renderer.render()
+        self.lap("display")
+
+    def lap(self, phase):
+        """add the time since the last lap to a phase, if timing"""
+        if self.timer is not None:
+            self.timer.lap(phase)
+
+    def time_generation(self, generation):
+        """start timing a new generation, writing the record of the last one"""
+        if not self.phase_timings or generation == self.timer_generation:
+            return
+        self.write_timings()
+        self.timer = PhaseTimer(VIEWER_PHASES)
+        self.timer_generation = generation
+        self.timer_start = time.perf_counter()
+
+    def write_timings(self):
+        """write the record of the generation being timed"""
+        if self.timer is None:
+            return
+        write_record(
+            config.VIEWER_PHASE_TIMINGS_FILE,
+            self.timer.get_record(
+                self.timer_generation, time.perf_counter() - self.timer_start
+            ),
+        )
+        self.timer = None
+
+
+def connect(address=None, authkey=None, wait=0):
+    """connect to a simulation's SnapshotPublisher, trying for up to wait seconds.
+    address and authkey default to VIEWER_ADDRESS and VIEWER_AUTHKEY"""
+    if address is None:
+        address = config.VIEWER_ADDRESS
+    if authkey is None:
+        authkey = config.VIEWER_AUTHKEY
+    give_up_time = time.monotonic() + wait
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if time.monotonic() >= give_up_time:
+                raise
+            time.sleep(0.1)
+
+
+def run_viewer(address=None, authkey=None, wait=0, phase_timings=False):
+    """attach a viewer to a simulation and run it until it's closed. See connect"""
+    connection = connect(address, authkey, wait)
+    try:
+        Viewer(connection, phase_timings).run()
+    finally:
+        connection.close()
+        pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--host", default=config.VIEWER_ADDRESS[0], help="where the run is"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=config.VIEWER_ADDRESS[1],
+        help="the port the run is serving snapshots on",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="write how long each phase of drawing takes (see phase_timer.py)",
+    )
+    args = parser.parse_args()
+    try:
+        run_viewer((args.host, args.port), phase_timings=args.timings)
+    except ConnectionRefusedError:
+        print("nothing to view: start main_maze_neat.py with --serve first")
+
+
+if __name__ == "__main__":
+    main()
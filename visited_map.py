@@ -0,0 +1,187 @@
+import math
+
+import numpy as np
+from numba import njit
+
+import config
+
+
+class VisitedMaps:
+    """records of where mice have been, like a scent trail, for a number of mice.
+    Each mouse's record is the size of the window, as if it were a float32 array
+    indexed [x, y], but it is split into square tiles (one per maze square by default)
+    and a tile is only allocated the first time a mouse leaves its scent on it.
+    Unallocated tiles read as zero. The tiles of all mice are kept in one pool,
+    so that numba functions can read them:
+        tile_index[mouse, tile_x, tile_y] is the tile in tiles, or -1
+        tiles[tile, x % tile_size, y % tile_size] is the alpha of a pixel
+    Fading is lazy. fades counts how many times each mouse's record has been faded
+    and tile_fades how many of those have been applied to each tile. The rest are
+    applied when a tile is next read or written, so the cost of fading depends on
+    how much of the maze a mouse looks at, not on the size of the window.
+    tile_changed[mouse, tile_x, tile_y] records which tiles have changed since they
+    were last taken with take_changed_tiles, so a viewer can be sent just those"""
+
+    def __init__(self, count, window_size, tile_size=config.MAZE_SQUARE_SIZE):
+        self.count = count
+        self.window_size = tuple(window_size)
+        self.tile_size = tile_size
+        tiles_x = math.ceil(window_size[0] / tile_size)
+        tiles_y = math.ceil(window_size[1] / tile_size)
+        self.tile_index = np.full((count, tiles_x, tiles_y), -1, dtype=np.int32)
+        # an array, rather than an int, so that numba functions can add to it
+        self.tiles_used = np.zeros(1, dtype=np.int64)
+        self.tiles = np.zeros((4 * count, tile_size, tile_size), dtype=np.float32)
+        self.fades = np.zeros(count, dtype=np.int64)
+        self.tile_fades = np.zeros(len(self.tiles), dtype=np.int64)
+        self.tile_changed = np.zeros((count, tiles_x, tiles_y), dtype=np.bool_)
+
+    def reserve(self, tiles_needed):
+        """make sure that there is room in the pool for this many more tiles"""
+        tiles_wanted = self.tiles_used[0] + tiles_needed
+        if tiles_wanted <= len(self.tiles):
+            return
+        tiles = np.zeros(
+            (max(tiles_wanted, 2 * len(self.tiles)), self.tile_size, self.tile_size),
+            dtype=np.float32,
+        )
+        tiles[: self.tiles_used[0]] = self.tiles[: self.tiles_used[0]]
+        self.tiles = tiles
+        tile_fades = np.zeros(len(tiles), dtype=np.int64)
+        tile_fades[: self.tiles_used[0]] = self.tile_fades[: self.tiles_used[0]]
+        self.tile_fades = tile_fades
+
+    def update_visited(
+        self, idx, positions, directions_radians, trail_circle_alpha, visited_path_radius
+    ):
+        """leave a circle of scent behind each mouse in idx. See Mouse.update_visited"""
+        # a circle can cover this many tiles at most
+        tiles_per_circle = (
+            math.ceil(trail_circle_alpha.shape[0] / self.tile_size) + 1
+        ) * (math.ceil(trail_circle_alpha.shape[1] / self.tile_size) + 1)
+        self.reserve(tiles_per_circle * len(idx))
+        update_visited(
+            self.tiles,
+            self.tile_index,
+            self.tile_fades,
+            self.fades,
+            self.tiles_used,
+            self.tile_changed,
+            idx,
+            positions,
+            directions_radians,
+            trail_circle_alpha,
+            visited_path_radius,
+        )
+
+    def fade_visited(self, idx):
+        """fade the records of the mice in idx. See Mouse.fade_visited.
+        The tiles are actually faded the next time they're used"""
+        self.fades[idx] += 1
+        # fading changes every tile the mice have
+        self.tile_changed[idx] |= self.tile_index[idx] >= 0
+
+    def take_changed_tiles(self, index, take_all=False):
+        """the tiles of one mouse's record that have changed since this was last
+        called for it, or all of its tiles if take_all is True, and forget that
+        they've changed. Returns the (tile_x, tile_y) of each as an (n, 2) array and
+        their alphas rounded to uint8, as an (n, tile_size, tile_size) array"""
+        if take_all:
+            self.tile_changed[index] = self.tile_index[index] >= 0
+        tiles_xy = np.argwhere(self.tile_changed[index])
+        self.tile_changed[index] = False
+        tiles = self.tile_index[index, tiles_xy[:, 0], tiles_xy[:, 1]]
+        for tile in tiles:
+            fade_tile(self.tiles, self.tile_fades, self.fades, index, tile)
+        return tiles_xy, np.rint(self.tiles[tiles]).astype(np.uint8)
+
+    def to_array(self, index):
+        """a window sized float32 array of one mouse's record, indexed [x, y]"""
+        visited_alpha = np.zeros(self.window_size, dtype=np.float32)
+        for tile_x, tile_y in zip(*np.nonzero(self.tile_index[index] >= 0)):
+            tile = self.tile_index[index, tile_x, tile_y]
+            fade_tile(self.tiles, self.tile_fades, self.fades, index, tile)
+            tile = self.tiles[tile]
+            left = tile_x * self.tile_size
+            top = tile_y * self.tile_size
+            section = visited_alpha[
+                left : left + self.tile_size, top : top + self.tile_size
+            ]
+            section[:, :] = tile[: section.shape[0], : section.shape[1]]
+        return visited_alpha
+
+
+@njit(cache=True)
+def fade_tile(tiles, tile_fades, fades, index, tile):
+    """apply any fades that one of a mouse's tiles has missed - like a scent fading
+    away. Each fade is applied in turn, so it comes out the same as if the whole
+    record had been faded every time"""
+    fade = np.float32(0.99)
+    while tile_fades[tile] < fades[index]:
+        tiles[tile] *= fade
+        tile_fades[tile] += 1
+
+
+@njit(cache=True)
+def get_visited_alpha(tiles, tile_index, tile_fades, fades, index, x, y):
+    """the alpha of a pixel in one mouse's record"""
+    tile_size = tiles.shape[1]
+    tile = tile_index[index, x // tile_size, y // tile_size]
+    if tile < 0:
+        return np.float32(0)
+    if tile_fades[tile] < fades[index]:
+        fade_tile(tiles, tile_fades, fades, index, tile)
+    return tiles[tile, x % tile_size, y % tile_size]
+
+
+@njit(cache=True)
+def update_visited(
+    tiles,
+    tile_index,
+    tile_fades,
+    fades,
+    tiles_used,
+    tile_changed,
+    idx,
+    positions,
+    directions_radians,
+    trail_circle_alpha,
+    visited_path_radius,
+):
+    """add a circular array behind each mouse in idx, allocating tiles as needed and
+    marking them as changed. Alpha only goes up to a level of saturation (max 255).
+    There must already be room in tiles for any new tiles"""
+    tile_size = tiles.shape[1]
+    width = tile_index.shape[1] * tile_size
+    height = tile_index.shape[2] * tile_size
+    for index in idx:
+        circle_top_left_x = round(
+            positions[index, 0]
+            - visited_path_radius * math.cos(directions_radians[index])
+            - visited_path_radius
+        )
+        circle_top_left_y = round(
+            positions[index, 1]
+            - visited_path_radius * math.sin(directions_radians[index])
+            - visited_path_radius
+        )
+        for i in range(trail_circle_alpha.shape[0]):
+            x = circle_top_left_x + i
+            if x < 0 or x >= width:
+                continue
+            for j in range(trail_circle_alpha.shape[1]):
+                y = circle_top_left_y + j
+                if y < 0 or y >= height:
+                    continue
+                tile = tile_index[index, x // tile_size, y // tile_size]
+                if tile < 0:
+                    tile = tiles_used[0]
+                    tiles_used[0] += 1
+                    tiles[tile] = 0
+                    tile_fades[tile] = fades[index]
+                    tile_index[index, x // tile_size, y // tile_size] = tile
+                elif tile_fades[tile] < fades[index]:
+                    fade_tile(tiles, tile_fades, fades, index, tile)
+                tile_changed[index, x // tile_size, y // tile_size] = True
+                alpha = tiles[tile, x % tile_size, y % tile_size] + trail_circle_alpha[i, j]
+                tiles[tile, x % tile_size, y % tile_size] = min(max(alpha, 0), 255)